@@ -0,0 +1,113 @@
+import bisect
+import heapq
+from typing import Iterable, List, Optional
+
+LAST_CHARACTER = chr(0x10FFFF)
+
+
+class Candidates:
+
+    def __init__(self, names: Iterable[str] = ()):
+        self._names = sorted(set(names))
+
+    def __len__(self):
+        return len(self._names)
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __contains__(self, name: str):
+        index = bisect.bisect_left(self._names, name)
+        return index < len(self._names) and self._names[index] == name
+
+    def count(self, prefix: str):
+        start, end = self._range(prefix)
+        return end - start
+
+    def starting_with(self, prefix: str):
+        start, end = self._range(prefix)
+        return self._names[start:end]
+
+    def shared_prefix(self, prefix: str) -> Optional[str]:
+        start, end = self._range(prefix)
+        if start == end:
+            return None
+
+        return _common_prefix(self._names[start], self._names[end - 1], len(prefix))
+
+    def _range(self, prefix: str):
+        start = bisect.bisect_left(self._names, prefix)
+        end = bisect.bisect_left(self._names, prefix + LAST_CHARACTER, lo=start)
+
+        return start, end
+
+
+class Completion:
+
+    def __init__(self, prefix: str, sources: Iterable[Candidates]):
+        self.prefix = prefix
+        self._sources = [
+            source
+            for source in sources
+            if source.count(prefix)
+        ]
+
+    @property
+    def count(self):
+        return sum(source.count(self.prefix) for source in self._sources)
+
+    @property
+    def is_empty(self):
+        return not self._sources
+
+    @property
+    def is_unique(self):
+        if self.is_empty:
+            return False
+
+        first = self._sources[0].shared_prefix(self.prefix)
+
+        return all(
+            source.count(self.prefix) == 1 and source.shared_prefix(self.prefix) == first
+            for source in self._sources
+        )
+
+    def shared_prefix(self) -> Optional[str]:
+        shared = None
+
+        for source in self._sources:
+            other = source.shared_prefix(self.prefix)
+
+            if shared is None:
+                shared = other
+            else:
+                shared = shared[:_common_length(shared, other, len(self.prefix))]
+
+        return shared
+
+    def matches(self) -> List[str]:
+        matches = []
+
+        for name in heapq.merge(*(source.starting_with(self.prefix) for source in self._sources)):
+            if not matches or matches[-1] != name:
+                matches.append(name)
+
+        return matches
+
+
+def complete(prefix: str, *sources: Candidates):
+    return Completion(prefix, sources)
+
+
+def _common_prefix(first: str, last: str, start: int = 0):
+    return first[:_common_length(first, last, start)]
+
+
+def _common_length(first: str, last: str, start: int = 0):
+    end = min(len(first), len(last))
+
+    index = start
+    while index < end and first[index] == last[index]:
+        index += 1
+
+    return index
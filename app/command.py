@@ -1,9 +1,11 @@
 import io
 import os
+import signal
 import sys
 import typing
 
-from . import completer, history, job, parser, variable
+from . import completer, completion, database, executable, history, job, parser, variable
+from .executable import which
 
 
 class RedirectStreams:
@@ -18,10 +20,20 @@ class RedirectStreams:
         self._output = output
         self._error = error
 
+        # exit status of the builtin, the return value is the shell's own exit code
+        self.status = 0
+
+        # run on a thread inside a pipeline, where a builtin must leave shell state alone
+        self.is_pipeline_stage = False
+
     @property
     def output(self):
         return self._output or sys.stdout
 
+    @property
+    def is_output_redirected(self):
+        return self._output is not None
+
     @property
     def output_fd(self):
         return self._find_fd(self.output)
@@ -30,6 +42,10 @@ class RedirectStreams:
     def error(self):
         return self._error or sys.stderr
 
+    @property
+    def is_error_redirected(self):
+        return self._error is not None
+
     @property
     def error_fd(self):
         return self._find_fd(self.error)
@@ -54,7 +70,7 @@ class RedirectStreams:
         raise ValueError(f"cannot find fd for: {x}")
 
     @staticmethod
-    def open(redirects: typing.List[parser.Redirect]):
+    def open(redirects: typing.List[parser.Redirect], default_output_fd: typing.Optional[int] = None):
         output = None
         error = None
 
@@ -74,24 +90,15 @@ class RedirectStreams:
             else:
                 stream.close()
 
+        if output is None and default_output_fd is not None:
+            output = open(os.dup(default_output_fd), "w")
+
         return RedirectStreams(
             output,
             error,
         )
 
 
-def which(program: str):
-    paths = os.environ.get("PATH", "").split(":")
-
-    for path in paths:
-        path = os.path.join(path, program)
-
-        if os.access(path, os.X_OK):
-            return path
-
-    return None
-
-
 def builtin_exit(arguments: typing.List[str], __):
     code = int(arguments[1]) if len(arguments) > 1 else 0
 
@@ -167,26 +174,56 @@ def builtin_history(arguments: typing.List[str], redirect_streams: RedirectStrea
     elif argv1 == "-a":
         history.write(arguments[2], append=True)
         return
+    elif argv1 in ("--slowest", "--cwd", "--failed"):
+        _print_records(arguments, redirect_streams)
+        return
+    elif argv1 == "--stats":
+        # lines run again from history are what the parse cache mostly serves
+        cache = parser.cache
+        print(
+            f"hits {cache.hits}, misses {cache.misses}, entries {len(cache)}, hit rate {cache.hit_rate:.1%}",
+            file=redirect_streams.output,
+        )
+        return
 
     for number, line in history.iterate(start):
         print(f"{number:-5}  {line}", file=redirect_streams.output)
 
 
+def _print_records(arguments: typing.List[str], redirect_streams: RedirectStreams):
+    if not database.is_enabled():
+        print(f"{arguments[0]}: {arguments[1]}: requires {database.FILE_ENVVAR}", file=redirect_streams.error)
+        return
+
+    argv2 = arguments[2] if len(arguments) > 2 else None
+
+    if arguments[1] == "--cwd":
+        records = database.in_directory(os.path.abspath(argv2 or "."))
+    else:
+        limit = int(argv2) if argv2 and argv2.isdigit() else database.DEFAULT_LIMIT
+        query = database.slowest if arguments[1] == "--slowest" else database.failed
+        records = query(limit)
+
+    for record in records:
+        print(f"{record.duration:9.3f}s  {record.status:3}  {record.cwd}  {record.command}", file=redirect_streams.output)
+
+
 def builtin_complete(arguments: typing.List[str], redirect_streams: RedirectStreams):
     flag = arguments[1]
 
-    if flag == "-C":
+    if flag in ("-C", "-P"):
         completer_path = arguments[2]
         program_name = arguments[3]
 
-        completer.register(program_name, completer_path)
+        completer.register(program_name, completer_path, is_persistent=flag == "-P")
 
     elif flag == "-p":
         program_name = arguments[2]
 
         handler_path = completer.get_handler(program_name)
         if handler_path:
-            print(f"{arguments[0]} -C '{handler_path}' {program_name}", file=redirect_streams.output)
+            handler_flag = "-P" if completer.is_persistent(program_name) else "-C"
+            print(f"{arguments[0]} {handler_flag} '{handler_path}' {program_name}", file=redirect_streams.output)
         else:
             print(f"{arguments[0]}: {program_name}: no completion specification", file=redirect_streams.error)
 
@@ -196,12 +233,127 @@ def builtin_complete(arguments: typing.List[str], redirect_streams: RedirectStre
         if not completer.unregister(program_name):
             print(f"{arguments[0]}: {program_name}: no completion specification", file=redirect_streams.error)
 
+    elif flag == "--stats":
+        cache = completion.cache
+        print(f"hits {cache.hits}, misses {cache.misses}, entries {len(cache)}", file=redirect_streams.output)
+
     else:
         print(f"{arguments[0]}: unknown flag: {flag}", file=redirect_streams.error)
 
 
 def builtin_jobs(arguments: typing.List[str], redirect_streams: RedirectStreams):
-    job.reap(print_running=True)
+    # a stage only lists the jobs, as a subshell would, and leaves reporting the finished ones to the shell
+    job.reap(print_running=True, file=redirect_streams.output, is_listing_only=redirect_streams.is_pipeline_stage)
+
+
+def builtin_fg(arguments: typing.List[str], redirect_streams: RedirectStreams):
+    found = _find_job(arguments, redirect_streams)
+    if found is None:
+        return
+
+    print(found.command, file=redirect_streams.output, flush=True)
+
+    if job.foreground(found):
+        redirect_streams.status = found.status
+    else:
+        redirect_streams.status = 128 + signal.SIGTSTP
+
+
+def builtin_bg(arguments: typing.List[str], redirect_streams: RedirectStreams):
+    found = _find_job(arguments, redirect_streams)
+    if found is not None:
+        job.background(found, file=redirect_streams.output)
+
+
+def builtin_kill(arguments: typing.List[str], redirect_streams: RedirectStreams):
+    targets = arguments[1:]
+    name = "TERM"
+
+    if targets[:1] == ["-s"] and len(targets) > 1:
+        name = targets[1]
+        targets = targets[2:]
+    elif targets and targets[0].startswith("-"):
+        name = targets[0][1:]
+        targets = targets[1:]
+
+    number = _signal_number(name)
+    if number is None:
+        print(f"{arguments[0]}: {name}: invalid signal specification", file=redirect_streams.error)
+        redirect_streams.status = 1
+        return
+
+    if not targets:
+        print(f"{arguments[0]}: usage: kill [-s sigspec | -sigspec] pid | jobspec ...", file=redirect_streams.error)
+        redirect_streams.status = 2
+        return
+
+    for target in targets:
+        try:
+            if target.startswith("%"):
+                found = job.find(target)
+                if found is None:
+                    print(f"{arguments[0]}: {target}: no such job", file=redirect_streams.error)
+                    redirect_streams.status = 1
+                    continue
+
+                job.kill(found, number)
+            else:
+                os.kill(int(target), number)
+        except ValueError:
+            print(f"{arguments[0]}: {target}: arguments must be process or job IDs", file=redirect_streams.error)
+            redirect_streams.status = 1
+        except ProcessLookupError:
+            print(f"{arguments[0]}: ({target}) - No such process", file=redirect_streams.error)
+            redirect_streams.status = 1
+
+
+def builtin_wait(arguments: typing.List[str], redirect_streams: RedirectStreams):
+    try:
+        if arguments[1:2] == ["-n"]:
+            status = job.wait_next()
+            redirect_streams.status = 127 if status is None else status
+            return
+
+        if len(arguments) == 1:
+            job.wait_all()
+            return
+
+        for spec in arguments[1:]:
+            found = job.find(spec)
+            if found is None:
+                print(f"{arguments[0]}: {spec}: no such job", file=redirect_streams.error)
+                redirect_streams.status = 127
+                continue
+
+            redirect_streams.status = job.wait_job(found)
+    except KeyboardInterrupt:
+        print()
+        redirect_streams.status = 128 + signal.SIGINT
+
+
+def _find_job(arguments: typing.List[str], redirect_streams: RedirectStreams):
+    spec = arguments[1] if len(arguments) > 1 else "%+"
+
+    found = job.find(spec)
+    if found is None:
+        print(f"{arguments[0]}: {spec}: no such job", file=redirect_streams.error)
+        redirect_streams.status = 1
+
+    return found
+
+
+def _signal_number(name: str):
+    if name.isdigit():
+        return int(name)
+
+    name = name.upper()
+    if not name.startswith("SIG"):
+        name = f"SIG{name}"
+
+    try:
+        return signal.Signals[name]
+    except KeyError:
+        return None
 
 
 def builtin_declare(arguments: typing.List[str], redirect_streams: RedirectStreams):
@@ -212,9 +364,12 @@ def builtin_declare(arguments: typing.List[str], redirect_streams: RedirectStrea
 
         value = variable.get(name)
         if value is not None:
-            print(f"{arguments[0]} -- {name}=\"{value}\"", file=redirect_streams.output)
+            attributes = "-x" if variable.is_exported(name) else "--"
+            print(f"{arguments[0]} {attributes} {name}=\"{value}\"", file=redirect_streams.output)
         else:
             print(f"{arguments[0]}: {name}: not found", file=redirect_streams.error)
+    elif flag == "-x":
+        _export(arguments, arguments[2:], redirect_streams)
     elif not flag.startswith("-"):
         name, value = flag.split("=", 1)
 
@@ -225,6 +380,114 @@ def builtin_declare(arguments: typing.List[str], redirect_streams: RedirectStrea
         variable.set(name, value)
 
 
+def builtin_export(arguments: typing.List[str], redirect_streams: RedirectStreams):
+    flag = arguments[1] if len(arguments) > 1 else "-p"
+
+    if flag == "-p":
+        for name, value in sorted(os.environ.items()):
+            print(f"declare -x {name}=\"{value}\"", file=redirect_streams.output)
+
+        for name in sorted(variable.exported - os.environ.keys()):
+            print(f"declare -x {name}", file=redirect_streams.output)
+    elif flag == "-n":
+        for name in arguments[2:]:
+            variable.unexport(name)
+    elif not flag.startswith("-"):
+        _export(arguments, arguments[1:], redirect_streams)
+    else:
+        print(f"{arguments[0]}: unknown flag: {flag}", file=redirect_streams.error)
+
+
+def _export(arguments: typing.List[str], assignments: typing.List[str], redirect_streams: RedirectStreams):
+    for assignment in assignments:
+        name, equals, value = assignment.partition("=")
+
+        if not name or not variable.is_valid_identifier(name):
+            print(f"{arguments[0]}: `{assignment}': not a valid identifier", file=redirect_streams.error)
+            continue
+
+        variable.export(name, value if equals else None)
+
+
+def builtin_set(arguments: typing.List[str], redirect_streams: RedirectStreams):
+    flag = arguments[1] if len(arguments) > 1 else None
+
+    if flag in ("-o", "+o") and len(arguments) > 2:
+        option = arguments[2]
+
+        if option not in OPTIONS:
+            print(f"{arguments[0]}: {option}: invalid option name", file=redirect_streams.error)
+        elif flag == "-o":
+            variable.options.add(option)
+        else:
+            variable.options.discard(option)
+
+    elif flag == "-o":
+        for option in OPTIONS:
+            state = "on" if option in variable.options else "off"
+            print(f"{option:<15}\t{state}", file=redirect_streams.output)
+
+    else:
+        print(f"{arguments[0]}: unknown flag: {flag}", file=redirect_streams.error)
+
+
+def builtin_hash(arguments: typing.List[str], redirect_streams: RedirectStreams):
+    flag = arguments[1] if len(arguments) > 1 else None
+
+    if flag is None:
+        if not executable.hashed:
+            print(f"{arguments[0]}: hash table empty", file=redirect_streams.output)
+            return
+
+        print("hits\tcommand", file=redirect_streams.output)
+        for entry in executable.hashed.values():
+            print(f"{entry.hits:4}\t{entry.path}", file=redirect_streams.output)
+
+    elif flag == "-r":
+        executable.rehash()
+
+    elif flag == "-p":
+        path = arguments[2]
+
+        for name in arguments[3:]:
+            executable.remember(name, path)
+
+    elif flag == "-d":
+        for name in arguments[2:]:
+            if not executable.forget(name):
+                print(f"{arguments[0]}: {name}: not found", file=redirect_streams.error)
+
+    elif flag == "-t":
+        names = arguments[2:]
+
+        for name in names:
+            entry = executable.hashed.get(name)
+            if entry is None:
+                print(f"{arguments[0]}: {name}: not found", file=redirect_streams.error)
+            elif len(names) > 1:
+                print(f"{name}\t{entry.path}", file=redirect_streams.output)
+            else:
+                print(entry.path, file=redirect_streams.output)
+
+    elif not flag.startswith("-"):
+        for name in arguments[1:]:
+            path = executable.search(name)
+
+            if path:
+                executable.remember(name, path)
+            else:
+                print(f"{arguments[0]}: {name}: not found", file=redirect_streams.error)
+
+    else:
+        print(f"{arguments[0]}: unknown flag: {flag}", file=redirect_streams.error)
+
+
+OPTIONS = ["pipefail"]
+
+# only read shell state, so a pipeline can run them in the shell itself instead of a subshell
+PIPELINE_BUILTINS = {"echo", "type", "pwd", "history", "jobs"}
+HISTORY_MUTATING_FLAGS = {"-r", "-w", "-a"}
+
 BUILTINS = {
     "exit": builtin_exit,
     "echo": builtin_echo,
@@ -234,5 +497,19 @@ BUILTINS = {
     "history": builtin_history,
     "complete": builtin_complete,
     "jobs": builtin_jobs,
+    "fg": builtin_fg,
+    "bg": builtin_bg,
+    "kill": builtin_kill,
+    "wait": builtin_wait,
     "declare": builtin_declare,
+    "export": builtin_export,
+    "hash": builtin_hash,
+    "set": builtin_set,
 }
+
+
+def is_pipeline_safe(arguments: typing.List[str]):
+    if arguments[0] == "history" and len(arguments) > 1:
+        return arguments[1] not in HISTORY_MUTATING_FLAGS
+
+    return arguments[0] in PIPELINE_BUILTINS
@@ -1,34 +1,207 @@
 import os
-import selectors
+import select
+import signal
 import subprocess
-from typing import Dict, Optional, Set
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
 
-from .parser import LineParser
+from .parser import parse
+
+PERSISTENT_ENVVAR = "COMP_PERSISTENT"
+IDLE_TIMEOUT = 60
+CHUNK_SIZE = 64 * 1024
 
 registered: Dict[str, str] = {}
+persistent: Set[str] = set()
+
+
+@dataclass
+class Coprocess:
+    handler_path: str
+    process: Optional[subprocess.Popen] = None
+    last_used: float = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    idle_timer: Optional[threading.Timer] = None
+
+    def request(self, fields: List[str], deadline: Optional[float] = None) -> Set[str]:
+        with self.lock:
+            self.last_used = time.monotonic()
+            self._schedule_idle_shutdown()
+
+            for attempt in range(2):
+                if self.process is None or self.process.poll() is not None:
+                    self._start()
+
+                try:
+                    return self._exchange(fields, deadline)
+                except (BrokenPipeError, EOFError):
+                    self._stop()
+
+                    # restarted once already, the handler keeps dying
+                    if attempt:
+                        raise
+                except TimeoutError:
+                    # a hung handler would hold the lock for every later request, the next one starts a fresh process
+                    self._stop(kill=True)
+                    raise
+
+    def shutdown(self):
+        with self.lock:
+            if self.idle_timer:
+                self.idle_timer.cancel()
+                self.idle_timer = None
+
+            self._stop()
+
+    def _start(self):
+        self.process = subprocess.Popen(
+            [self.handler_path],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env={
+                **os.environ,
+                PERSISTENT_ENVVAR: "1",
+            },
+            start_new_session=True,
+        )
+
+    def _stop(self, kill=False):
+        process, self.process = self.process, None
+        if process is None:
+            return
+
+        if kill:
+            _kill(process)
+
+        for stream in (process.stdin, process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+        try:
+            process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            _kill(process)
+            process.wait()
+
+    def _exchange(self, fields: List[str], deadline: Optional[float]):
+        frame = bytearray(f"{len(fields)}\n".encode())
+        for value in fields:
+            encoded = value.encode()
+            frame += f"{len(encoded)}\n".encode()
+            frame += encoded
+            frame += b"\n"
+
+        self.process.stdin.write(frame)
+        self.process.stdin.flush()
+
+        fd = self.process.stdout.fileno()
+        response = bytearray(b"\n")
+
+        # the reply ends with an empty line
+        while b"\n\n" not in response:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError()
+
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                raise TimeoutError()
+
+            chunk = os.read(fd, CHUNK_SIZE)
+            if not chunk:
+                raise EOFError()
+
+            response += chunk
+
+        lines = response[1:response.index(b"\n\n") + 1].decode().splitlines()
+        return set(lines)
+
+    def _schedule_idle_shutdown(self):
+        if self.idle_timer is None:
+            self._start_idle_timer(IDLE_TIMEOUT)
+
+    def _start_idle_timer(self, delay: float):
+        self.idle_timer = threading.Timer(delay, self._shutdown_if_idle)
+        self.idle_timer.daemon = True
+        self.idle_timer.start()
+
+    def _shutdown_if_idle(self):
+        with self.lock:
+            if self.idle_timer is None:
+                return
+
+            # one timer at a time, re-armed for whatever is left of the idle time
+            idle = time.monotonic() - self.last_used
+            if idle < IDLE_TIMEOUT:
+                self._start_idle_timer(IDLE_TIMEOUT - idle)
+                return
+
+            self.idle_timer = None
+            self._stop()
 
 
-def register(program: str, handler_path: str):
+coprocesses: Dict[str, Coprocess] = {}
+
+
+def register(program: str, handler_path: str, is_persistent=False):
     registered[program] = handler_path
 
+    if is_persistent:
+        persistent.add(program)
+    else:
+        persistent.discard(program)
+
 
 def unregister(program: str) -> bool:
-    return registered.pop(program, None) is not None
+    handler_path = registered.pop(program, None)
+    persistent.discard(program)
+
+    if handler_path is None:
+        return False
+
+    if handler_path not in registered.values():
+        coprocess = coprocesses.pop(handler_path, None)
+        if coprocess:
+            coprocess.shutdown()
+
+    return True
 
 
 def get_handler(program: str) -> Optional[str]:
     return registered.get(program)
 
 
-def collect(program: str, line: str) -> Optional[Set[str]]:
+def is_persistent(program: str):
+    return program in persistent
+
+
+def collect(program: str, line: str, deadline: Optional[float] = None) -> Optional[Set[str]]:
     handler_path = get_handler(program)
     if not handler_path:
         return None
 
-    command = LineParser(line).parse()[-1]
+    command = parse(line)[-1]
     last_argument = command.arguments[-1]
     previous_argument = command.arguments[-2] if len(command.arguments) > 1 else ""
 
+    if is_persistent(program):
+        coprocess = coprocesses.get(handler_path)
+        if coprocess is None:
+            coprocess = coprocesses.setdefault(handler_path, Coprocess(handler_path))
+
+        return coprocess.request([
+            line,
+            str(len(line)),
+            program,
+            last_argument,
+            previous_argument,
+        ], deadline)
+
     env = {
         **os.environ,
         "COMP_LINE": line,
@@ -37,39 +210,41 @@ def collect(program: str, line: str) -> Optional[Set[str]]:
 
     process = subprocess.Popen(
         [handler_path, program, last_argument, previous_argument],
-        bufsize=1,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
         universal_newlines=True,
         env=env,
+        start_new_session=True,
     )
 
-    candidates: Set[str] = set()
-
-    def handle_output(stream, mask):
-        line = stream.readline().rstrip("\n")
-
-        if not line:
-            return
-
-        candidates.add(line)
-
-    with selectors.DefaultSelector() as selector:
-        selector.register(process.stdout, selectors.EVENT_READ, handle_output)
-
-        while process.poll() is None:
-            _collect(selector)
+    timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
 
+    # reads to the end, output still buffered in the pipe when the handler exits is part of the answer
+    try:
+        output, _ = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        _kill(process)
+        process.stdout.close()
         process.wait()
+        raise TimeoutError()
+
+    return {
+        line
+        for line in output.splitlines()
+        if line
+    }
 
-        _collect(selector)
 
-    return candidates
+def destroy():
+    for coprocess in coprocesses.values():
+        coprocess.shutdown()
 
+    coprocesses.clear()
 
-def _collect(selector: selectors.BaseSelector):
-    events = selector.select()
 
-    for key, mask in events:
-        callback = key.data
-        callback(key.fileobj, mask)
+def _kill(process: subprocess.Popen):
+    # the whole session, children of a handler script hold its output pipe open too
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
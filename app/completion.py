@@ -0,0 +1,212 @@
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from . import variable
+from .candidates import Candidates
+
+TIMEOUT_ENVVAR = "COMP_TIMEOUT_MS"
+DEFAULT_TIMEOUT_MS = 250
+MAX_WORKERS = 4
+CACHE_CAPACITY = 128
+CACHE_TTL = 10
+
+Source = Callable[[], Candidates]
+
+
+@dataclass
+class Gathered:
+    results: Dict[Hashable, Candidates]
+    partial: bool
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    created: float
+    mtimes: Tuple[Tuple[str, Optional[int]], ...]
+
+
+class Cache:
+
+    def __init__(self, capacity=CACHE_CAPACITY, ttl=CACHE_TTL):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable):
+        entry = self._entries.get(key)
+
+        if entry is not None and not self._is_valid(entry):
+            del self._entries[key]
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+
+        return entry.value
+
+    def put(self, key: Hashable, value: Any, directories: Iterable[str] = ()):
+        mtimes = tuple(
+            (directory, _mtime(directory))
+            for directory in directories
+        )
+
+        self._entries[key] = CacheEntry(value, time.monotonic(), mtimes)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def _is_valid(self, entry: CacheEntry):
+        if time.monotonic() - entry.created > self.ttl:
+            return False
+
+        return all(
+            _mtime(directory) == mtime
+            for directory, mtime in entry.mtimes
+        )
+
+
+cache = Cache()
+
+# by source name, the first element of a tuple key, so that a source has one call in flight whatever the line
+pending: Dict[Hashable, Tuple[Hashable, Future]] = {}
+late: Dict[Hashable, Tuple[Hashable, Candidates]] = {}
+
+_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+_workers: List[threading.Thread] = []
+
+
+def timeout():
+    value = variable.get(TIMEOUT_ENVVAR) or os.environ.get(TIMEOUT_ENVVAR)
+
+    try:
+        milliseconds = int(value) if value else DEFAULT_TIMEOUT_MS
+    except ValueError:
+        milliseconds = DEFAULT_TIMEOUT_MS
+
+    return max(milliseconds, 0) / 1000
+
+
+def gather(sources: Dict[Hashable, Source]):
+    results: Dict[Hashable, Candidates] = {}
+    futures: Dict[Future, Hashable] = {}
+    is_busy = False
+    is_failed = False
+
+    for key, source in sources.items():
+        name = _name_of(key)
+
+        stored = late.pop(name, None)
+        if stored is not None and stored[0] == key:
+            results[key] = stored[1]
+            continue
+
+        running = pending.get(name)
+        if running is None:
+            running = pending[name] = (key, _submit(source))
+        elif running[0] != key:
+            # still busy with an earlier line, a hung handler must not take up the whole pool
+            is_busy = True
+            continue
+
+        futures[running[1]] = key
+
+    deadline = time.monotonic() + timeout()
+    not_done = set(futures.keys())
+
+    while not_done:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+
+        _, not_done = wait(not_done, timeout=remaining, return_when=FIRST_COMPLETED)
+
+    for future, key in futures.items():
+        if future in not_done:
+            future.add_done_callback(lambda future, key=key: _store_late(key, future))
+            continue
+
+        pending.pop(_name_of(key), None)
+        results[key] = _result_of(future)
+
+        # an empty answer from a failed source must not be cached as if it were complete
+        if future.exception() is not None:
+            is_failed = True
+
+    return Gathered(results, partial=bool(not_done) or is_busy or is_failed)
+
+
+def _name_of(key: Hashable):
+    return key[0] if isinstance(key, tuple) else key
+
+
+def _mtime(directory: str):
+    try:
+        return os.stat(directory or ".").st_mtime_ns
+    except OSError:
+        return None
+
+
+def _store_late(key: Hashable, future: Future):
+    name = _name_of(key)
+
+    if pending.get(name) == (key, future):
+        del pending[name]
+
+        # a source that timed out or failed is simply run again
+        if future.exception() is None:
+            late[name] = (key, future.result())
+
+
+def _result_of(future: Future):
+    if future.exception() is not None:
+        return Candidates()
+
+    return future.result()
+
+
+def _submit(source: Source):
+    future = Future()
+    _queue.put((future, source))
+
+    if len(_workers) < MAX_WORKERS:
+        # daemon threads, so that a hung source never keeps the shell from exiting
+        worker = threading.Thread(target=_work, name="completion", daemon=True)
+        worker.start()
+
+        _workers.append(worker)
+
+    return future
+
+
+def _work():
+    while True:
+        future, source = _queue.get()
+
+        if not future.set_running_or_notify_cancel():
+            continue
+
+        try:
+            future.set_result(source())
+        except BaseException as exception:
+            future.set_exception(exception)
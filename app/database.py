@@ -0,0 +1,135 @@
+import os
+import sqlite3
+import time
+from dataclasses import astuple, dataclass
+from typing import List, Optional
+
+FILE_ENVVAR = "HISTDB"
+BATCH_SIZE = 32
+FLUSH_INTERVAL = 5
+DEFAULT_LIMIT = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS commands (
+    id INTEGER PRIMARY KEY,
+    command TEXT NOT NULL,
+    started REAL NOT NULL,
+    duration REAL NOT NULL,
+    status INTEGER NOT NULL,
+    cwd TEXT NOT NULL,
+    pipeline_length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS commands_duration ON commands (duration);
+CREATE INDEX IF NOT EXISTS commands_cwd ON commands (cwd, started);
+CREATE INDEX IF NOT EXISTS commands_failed ON commands (started) WHERE status != 0;
+"""
+
+COLUMNS = "command, started, duration, status, cwd, pipeline_length"
+
+SLOWEST_QUERY = f"SELECT {COLUMNS} FROM commands ORDER BY duration DESC LIMIT ?"
+CWD_QUERY = f"SELECT {COLUMNS} FROM commands WHERE cwd = ? ORDER BY started DESC LIMIT ?"
+FAILED_QUERY = f"SELECT {COLUMNS} FROM commands WHERE status != 0 ORDER BY started DESC LIMIT ?"
+
+
+@dataclass
+class Record:
+    command: str
+    started: float
+    duration: float
+    status: int
+    cwd: str
+    pipeline_length: int
+
+
+connection: Optional[sqlite3.Connection] = None
+
+pending: List[Record] = []
+last_flush = 0.0
+
+
+def is_enabled():
+    return connection is not None
+
+
+def initialize():
+    global connection, last_flush
+
+    path = os.environ.get(FILE_ENVVAR)
+    if not path:
+        return
+
+    try:
+        connection = sqlite3.connect(path)
+
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+    except sqlite3.Error as error:
+        print(f"{FILE_ENVVAR}: {path}: {error}")
+        connection = None
+
+    last_flush = time.monotonic()
+
+
+def destroy():
+    global connection
+
+    if connection is None:
+        return
+
+    flush()
+
+    connection.close()
+    connection = None
+
+
+def record(entry: Record):
+    if connection is None:
+        return
+
+    pending.append(entry)
+
+    if len(pending) >= BATCH_SIZE or time.monotonic() - last_flush >= FLUSH_INTERVAL:
+        flush()
+
+
+def flush():
+    global last_flush
+
+    last_flush = time.monotonic()
+
+    if connection is None or not pending:
+        return
+
+    rows = [astuple(entry) for entry in pending]
+    pending.clear()
+
+    try:
+        with connection:
+            connection.executemany(f"INSERT INTO commands ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)", rows)
+    except sqlite3.Error as error:
+        print(f"{FILE_ENVVAR}: {error}")
+
+
+def slowest(limit: int = DEFAULT_LIMIT):
+    return _query(SLOWEST_QUERY, limit)
+
+
+def in_directory(cwd: str, limit: int = DEFAULT_LIMIT):
+    return _query(CWD_QUERY, cwd, limit)
+
+
+def failed(limit: int = DEFAULT_LIMIT):
+    return _query(FAILED_QUERY, limit)
+
+
+def _query(query: str, *parameters):
+    if connection is None:
+        return []
+
+    flush()
+
+    return [
+        Record(*row)
+        for row in connection.execute(query, parameters)
+    ]
@@ -0,0 +1,409 @@
+from typing import Callable, List, Optional
+
+from .terminal import columns, display, rows
+
+CLEAR_TO_END = "\x1b[K"
+CLEAR_TO_SCREEN_END = "\x1b[J"
+SUGGESTION_STYLE = "\x1b[90m"
+RESET_STYLE = "\x1b[0m"
+
+
+class GapBuffer:
+
+    def __init__(self, text: str = "", capacity: int = 64):
+        size = max(capacity, len(text) * 2)
+
+        self._buffer: List[str] = list(text) + [""] * (size - len(text))
+        self._gap_start = len(text)
+        self._gap_end = size
+
+        # display widths, kept up to date by every edit so that the editor never measures the whole line
+        self._width_before = _width(text)
+        self._width_after = 0
+
+    def __len__(self):
+        return len(self._buffer) - (self._gap_end - self._gap_start)
+
+    def __str__(self):
+        return self.before_cursor() + self.after_cursor()
+
+    @property
+    def cursor(self):
+        return self._gap_start
+
+    @property
+    def remaining(self):
+        return len(self._buffer) - self._gap_end
+
+    @property
+    def width_before(self):
+        return self._width_before
+
+    @property
+    def width(self):
+        return self._width_before + self._width_after
+
+    def before_cursor(self, count: Optional[int] = None):
+        start = 0 if count is None else max(self._gap_start - count, 0)
+        return "".join(self._buffer[start:self._gap_start])
+
+    def after_cursor(self, count: Optional[int] = None):
+        end = len(self._buffer) if count is None else self._gap_end + count
+        return "".join(self._buffer[self._gap_end:end])
+
+    def character_before(self, offset: int = 0):
+        index = self._gap_start - 1 - offset
+        return self._buffer[index] if index >= 0 else None
+
+    def character_after(self, offset: int = 0):
+        index = self._gap_end + offset
+        return self._buffer[index] if index < len(self._buffer) else None
+
+    def insert(self, text: str):
+        if len(text) > self._gap_end - self._gap_start:
+            self._grow(len(text))
+
+        end = self._gap_start + len(text)
+        self._buffer[self._gap_start:end] = text
+        self._gap_start = end
+
+        self._width_before += _width(text)
+
+    def delete_before(self, count: int = 1):
+        count = min(count, self._gap_start)
+
+        start = self._gap_start - count
+        removed = "".join(self._buffer[start:self._gap_start])
+        self._gap_start = start
+
+        self._width_before -= _width(removed)
+
+        return removed
+
+    def delete_after(self, count: int = 1):
+        count = min(count, self.remaining)
+
+        end = self._gap_end + count
+        removed = "".join(self._buffer[self._gap_end:end])
+        self._gap_end = end
+
+        self._width_after -= _width(removed)
+
+        return removed
+
+    def move(self, offset: int):
+        if offset < 0:
+            count = min(-offset, self._gap_start)
+
+            moved = self._buffer[self._gap_start - count:self._gap_start]
+            self._buffer[self._gap_end - count:self._gap_end] = moved
+            self._gap_start -= count
+            self._gap_end -= count
+        else:
+            count = min(offset, self.remaining)
+
+            moved = self._buffer[self._gap_end:self._gap_end + count]
+            self._buffer[self._gap_start:self._gap_start + count] = moved
+            self._gap_start += count
+            self._gap_end += count
+
+        moved = "".join(moved)
+
+        width = _width(moved)
+        if offset < 0:
+            self._width_before -= width
+            self._width_after += width
+        else:
+            self._width_before += width
+            self._width_after -= width
+
+        return moved
+
+    def _grow(self, needed: int):
+        after = self._buffer[self._gap_end:]
+        size = max(len(self._buffer) * 2, len(self) + needed * 2)
+
+        self._buffer = self._buffer[:self._gap_start] + [""] * (size - self._gap_start - len(after)) + after
+        self._gap_end = size - len(after)
+
+
+class LineEditor:
+
+    def __init__(self, write: Callable[[str], None], prompt_width: int = 0):
+        self._write = write
+        self._buffer = GapBuffer()
+        self._suggestion = ""
+        self._prompt_width = prompt_width
+
+    def __len__(self):
+        return len(self._buffer)
+
+    @property
+    def text(self):
+        return str(self._buffer)
+
+    @property
+    def at_end(self):
+        return not self._buffer.remaining
+
+    @property
+    def suggestion(self):
+        return self._suggestion
+
+    def insert(self, text: str):
+        cursor = self._cursor()
+        is_wrapped = self._is_wrapped()
+        at_end = self.at_end
+
+        self._buffer.insert(text)
+
+        is_cleared = False
+        if self._suggestion.startswith(text):
+            # typed over the start of the hint, the rest of it is still on screen
+            self._suggestion = self._suggestion[len(text):]
+        elif self._suggestion:
+            self._suggestion = ""
+            is_cleared = True
+
+        if is_wrapped or self._is_wrapped():
+            self._rewrite(cursor, cursor)
+            return
+
+        shown = display(text)
+
+        if not at_end:
+            self._write(_insert(len(shown)))
+
+        self._write(shown)
+
+        if is_cleared:
+            self._write(CLEAR_TO_END)
+
+    def suggest(self, suggestion: str):
+        if suggestion == self._suggestion:
+            return
+
+        cursor = self._cursor()
+        is_wrapped = self._is_wrapped()
+
+        previous, self._suggestion = self._suggestion, suggestion
+
+        if is_wrapped or self._is_wrapped():
+            self._rewrite(cursor, cursor)
+            return
+
+        if previous:
+            self._write(CLEAR_TO_END)
+
+        if suggestion:
+            self._write(SUGGESTION_STYLE + display(suggestion) + RESET_STYLE + _left(_width(suggestion)))
+
+    def accept_suggestion(self):
+        if self._suggestion:
+            self.insert(self._suggestion)
+
+    def backspace(self):
+        self.suggest("")
+
+        cursor = self._cursor()
+        is_wrapped = self._is_wrapped()
+
+        removed = self._buffer.delete_before()
+        if not removed:
+            return False
+
+        width = _width(removed)
+
+        if is_wrapped:
+            self._rewrite(cursor, cursor - width)
+        elif self.at_end:
+            self._write("\b" * width + " " * width + "\b" * width)
+        else:
+            self._write(_left(width) + _delete(width))
+
+        return True
+
+    def delete(self):
+        cursor = self._cursor()
+        is_wrapped = self._is_wrapped()
+
+        removed = self._buffer.delete_after()
+        if not removed:
+            return False
+
+        if is_wrapped:
+            self._rewrite(cursor, cursor)
+        else:
+            self._write(_delete(_width(removed)))
+
+        return True
+
+    def left(self, count: int = 1):
+        self.suggest("")
+        self._move_cursor(-count)
+
+    def right(self, count: int = 1):
+        self._move_cursor(count)
+
+    def home(self):
+        self.left(self._buffer.cursor)
+
+    def end(self):
+        self.right(self._buffer.remaining)
+
+    def word_left(self):
+        count = 0
+
+        while (character := self._buffer.character_before(count)) is not None and character.isspace():
+            count += 1
+
+        while (character := self._buffer.character_before(count)) is not None and not character.isspace():
+            count += 1
+
+        self.left(count)
+
+    def word_right(self):
+        count = 0
+
+        while (character := self._buffer.character_after(count)) is not None and character.isspace():
+            count += 1
+
+        while (character := self._buffer.character_after(count)) is not None and not character.isspace():
+            count += 1
+
+        self.right(count)
+
+    def replace(self, text: str):
+        self.suggest("")
+
+        cursor = self._cursor()
+        is_wrapped = self._is_wrapped()
+
+        before = display(self._buffer.before_cursor())
+        old = before + display(self._buffer.after_cursor())
+        new = display(text)
+
+        shared = 0
+        end = min(len(old), len(new))
+        while shared < end and old[shared] == new[shared]:
+            shared += 1
+
+        self._buffer = GapBuffer(text)
+
+        if is_wrapped or self._is_wrapped():
+            self._rewrite(cursor, self._prompt_width + shared)
+            return
+
+        if shared < len(before):
+            self._write(_left(len(before) - shared))
+        else:
+            self._write(_right(shared - len(before)))
+
+        self._write(new[shared:])
+        if len(new) < len(old):
+            self._write(CLEAR_TO_END)
+
+    def clear(self):
+        self._write(_move(self._cursor(), 0) + CLEAR_TO_SCREEN_END)
+
+    def redraw(self, prompt: str, text: Optional[str] = None):
+        if text is not None:
+            self._buffer = GapBuffer(text)
+
+        self._suggestion = ""
+        self._prompt_width = _width(prompt)
+
+        self._write("\r" + prompt)
+        self._rewrite(self._prompt_width, self._prompt_width)
+
+    def _cursor(self):
+        return self._prompt_width + self._buffer.width_before
+
+    def _is_wrapped(self):
+        # the fast paths only hold within one row, a line filling the row leaves the cursor in the pending wrap
+        return self._prompt_width + self._buffer.width + _width(self._suggestion) >= columns()
+
+    def _move_cursor(self, offset: int):
+        cursor = self._cursor()
+        moved = _width(self._buffer.move(offset))
+
+        if self._is_wrapped():
+            self._write(_move(cursor, self._cursor()))
+        elif offset < 0:
+            self._write(_left(moved))
+        else:
+            self._write(_right(moved))
+
+    def _rewrite(self, cursor: int, start: int):
+        # redraws from start to the end of the line, which may span several rows, then puts the cursor back
+        position = self._cursor()
+
+        # only text around the cursor is taken out of the buffer, and no more after it than a screen can show
+        count = position - start
+        shown = display(self._buffer.before_cursor(count))[-count:] if count > 0 else ""
+
+        limit = position + max(rows() - 1, 1) * columns()
+        text_end = position + self._buffer.width - self._buffer.width_before
+        after = min(text_end, limit) - position
+
+        shown += display(self._buffer.after_cursor(after))[:after]
+        suggestion = display(self._suggestion)[:max(limit - text_end, 0)]
+        end = start + len(shown) + len(suggestion)
+
+        self._write(_move(cursor, start) + shown)
+
+        if suggestion:
+            self._write(SUGGESTION_STYLE + suggestion + RESET_STYLE)
+
+        if end > start and end % columns() == 0:
+            # leaves the pending wrap, so that the cursor is where end says
+            self._write("\r\n")
+
+        self._write(CLEAR_TO_SCREEN_END + _move(end, position))
+
+
+def _width(text: str):
+    return len(display(text))
+
+
+def _left(count: int):
+    if not count:
+        return ""
+
+    if count == 1:
+        return "\b"
+
+    return _sequence(count, "D")
+
+
+def _right(count: int):
+    return _sequence(count, "C") if count else ""
+
+
+def _move(origin: int, target: int):
+    width = columns()
+    rows = target // width - origin // width
+
+    if rows < 0:
+        vertical = _sequence(-rows, "A")
+    elif rows > 0:
+        vertical = _sequence(rows, "B")
+    else:
+        vertical = ""
+
+    return vertical + "\r" + _right(target % width)
+
+
+def _insert(count: int):
+    return _sequence(count, "@")
+
+
+def _delete(count: int):
+    return _sequence(count, "P")
+
+
+def _sequence(count: int, final: str):
+    if count == 1:
+        return f"\x1b[{final}"
+
+    return f"\x1b[{count}{final}"
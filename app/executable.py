@@ -0,0 +1,157 @@
+import itertools
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from .candidates import Candidates
+
+PATH_ENVVAR = "PATH"
+
+# a directory changed this close to its scan may change again without its mtime moving, on filesystems with coarse timestamps
+RACY_WINDOW_NS = 2_000_000_000
+
+
+@dataclass
+class HashedCommand:
+    path: str
+    hits: int = 0
+
+
+@dataclass
+class IndexedDirectory:
+    mtime: int
+    scanned: int
+    names: Candidates
+
+    @property
+    def is_racy(self):
+        return self.scanned - self.mtime < RACY_WINDOW_NS
+
+hashed: Dict[str, HashedCommand] = {}
+hashed_path_value: Optional[str] = None
+
+indexed: Dict[str, IndexedDirectory] = {}
+
+merged: Optional[Candidates] = None
+merged_key: Optional[Tuple] = None
+
+
+def which(program: str) -> Optional[str]:
+    if "/" in program:
+        return program if os.access(program, os.X_OK) else None
+
+    _invalidate_if_path_changed()
+
+    entry = hashed.get(program)
+    if entry is not None:
+        if os.access(entry.path, os.X_OK):
+            entry.hits += 1
+            return entry.path
+
+        del hashed[program]
+
+    path = search(program)
+    if path is not None and os.path.isabs(path):
+        hashed[program] = HashedCommand(path, hits=1)
+
+    return path
+
+
+def search(program: str) -> Optional[str]:
+    for directory in path_directories():
+        index = _index(directory)
+
+        if index is not None and program in index.names:
+            return os.path.join(directory, program)
+
+        # chmod +x leaves the directory mtime alone, so a miss is checked against the file itself
+        path = os.path.join(directory, program)
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            # rescanned on the next lookup, so that completion offers it too
+            indexed.pop(_key(directory), None)
+            return path
+
+    return None
+
+
+def candidates() -> Candidates:
+    global merged, merged_key
+
+    indexes = [
+        index
+        for index in map(_index, path_directories())
+        if index is not None
+    ]
+
+    key = tuple(indexes)
+    if merged is None or key != merged_key:
+        merged = Candidates(itertools.chain.from_iterable(index.names for index in indexes))
+        merged_key = key
+
+    return merged
+
+
+def remember(program: str, path: str):
+    _invalidate_if_path_changed()
+
+    hashed[program] = HashedCommand(path)
+
+
+def forget(program: str) -> bool:
+    return hashed.pop(program, None) is not None
+
+
+def rehash():
+    hashed.clear()
+
+
+def _invalidate_if_path_changed():
+    global hashed_path_value
+
+    value = os.environ.get(PATH_ENVVAR, "")
+    if value != hashed_path_value:
+        hashed.clear()
+        hashed_path_value = value
+
+
+def path_directories():
+    return os.environ.get(PATH_ENVVAR, "").split(":")
+
+
+def _key(directory: str):
+    return os.path.abspath(directory or ".")
+
+
+def _index(directory: str) -> Optional[IndexedDirectory]:
+    key = _key(directory)
+
+    try:
+        mtime = os.stat(key).st_mtime_ns
+    except OSError:
+        indexed.pop(key, None)
+        return None
+
+    index = indexed.get(key)
+    if index is None or index.mtime != mtime or index.is_racy:
+        index = IndexedDirectory(mtime, time.time_ns(), _list_executables(key))
+        indexed[key] = index
+
+    return index
+
+
+def _list_executables(directory: str):
+    names = []
+
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file() and os.access(entry.path, os.X_OK):
+                        names.append(entry.name)
+                except OSError:
+                    continue
+    except OSError:
+        pass
+
+    return Candidates(names)
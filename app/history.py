@@ -1,56 +1,158 @@
+import fcntl
+import io
+import itertools
 import os
+import stat
+import tempfile
 from typing import Optional
 
+from .lines import Lines, FileLines
+from .search import PrefixIndex, TrigramIndex
+
 FILE_ENVVAR = "HISTFILE"
+SIZE_ENVVAR = "HISTSIZE"
+FILE_SIZE_ENVVAR = "HISTFILESIZE"
+CONTROL_ENVVAR = "HISTCONTROL"
+SHARE_ENVVAR = "HISTSHARE"
+SUGGESTION_DEPTH = 10_000
+INDEX_STEP = 200
+LOCK_SUFFIX = ".lock"
 
-previous_lines = []
+previous_lines = Lines()
 last_append_index = 0
 
+index = TrigramIndex()
+prefixes = PrefixIndex()
+
+file_inode: Optional[int] = None
+file_offset = 0
+
+session_fd: Optional[int] = None
+
 
 def add_line(line):
-    previous_lines.append(line)
+    control = _control()
+
+    if "ignorespace" in control and line.startswith(" "):
+        return
+
+    if _is_shared():
+        _append_shared(line, control)
+        return
+
+    _add_controlled(line, control)
+
+
+def search(query: str, before: Optional[int] = None) -> Optional[int]:
+    if not query:
+        return None
+
+    if before is None:
+        before = len(previous_lines)
+
+    # a few new entries, such as lines read from a shared HISTFILE, are indexed right away
+    if previous_lines.total - max(len(index), previous_lines.dropped) <= INDEX_STEP:
+        index_pending()
+
+    dropped = previous_lines.dropped
+    end = previous_lines.absolute_of(before) if before < len(previous_lines) else previous_lines.total
+    indexed = min(max(len(index), dropped), end)
+
+    # a loaded HISTFILE is indexed while the shell waits for input, entries it has not reached yet are checked one by one
+    candidates = itertools.chain(range(end - 1, indexed - 1, -1), index.candidates(query, indexed))
+
+    for absolute in candidates:
+        if absolute < dropped:
+            break
+
+        if previous_lines.is_live(absolute) and query in previous_lines.get(absolute):
+            return previous_lines.index_of(absolute)
+
+    return None
+
+
+def suggest(prefix: str) -> Optional[str]:
+    if not prefix:
+        return None
+
+    _update_prefixes()
+
+    absolute = prefixes.newest(prefix)
+    if absolute is None or not previous_lines.is_live(absolute):
+        return None
+
+    return previous_lines.get(absolute)[len(prefix):] or None
 
 
 def iterate(start: Optional[int] = None):
     if start is None:
         start = 0
     else:
-        start = len(previous_lines) - start
+        start = max(len(previous_lines) - start, 0)
 
     for index in range(start, len(previous_lines)):
-        yield (index + 1, previous_lines[index])
+        yield (previous_lines.dropped + index + 1, previous_lines[index])
 
 
 def read(path: str):
-    with open(path, "r") as fd:
-        for line in fd:
-            line = line.strip("\n")
+    mapped = FileLines(path)
 
-            if line:
-                add_line(line)
+    previous_lines.extend(mapped)
+    _trim()
+
+    return mapped
 
 
 def write(path: str, append=False):
     global last_append_index
 
-    mode = "a" if append else "w"
+    start = max(previous_lines.index_of(last_append_index), 0)
 
-    with open(path, mode) as fd:
-        for line in previous_lines[last_append_index:]:
-            fd.write(line + "\n")
+    if append:
+        with open(path, "ab") as fd:
+            previous_lines.write_to(fd, start)
+    else:
+        limit = _limit(FILE_SIZE_ENVVAR)
+        if limit is not None:
+            start = max(start, len(previous_lines) - limit)
 
-    last_append_index = len(previous_lines)
+        _replace(path, lambda fd: previous_lines.write_to(fd, start))
+
+    last_append_index = previous_lines.total
+
+
+def synchronize():
+    path = os.environ.get(FILE_ENVVAR)
+    if not path or not _is_shared():
+        return
+
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return
+
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH)
+        _read_new_lines(fd)
+    finally:
+        os.close(fd)
 
 
 def initialize():
+    global file_inode, file_offset
+
     path = os.environ.get(FILE_ENVVAR)
     if not path:
         return
 
+    if _is_shared():
+        _join_sessions(path)
+
     if not os.path.isfile(path):
         return
 
-    read(path)
+    mapped = read(path)
+    file_inode, file_offset = mapped.inode, mapped.size
 
 
 def destroy():
@@ -58,4 +160,209 @@ def destroy():
     if not path:
         return
 
+    if _is_shared():
+        _truncate_shared(path)
+        return
+
     write(path)
+
+
+def _add_controlled(line: str, control):
+    if "ignoredups" in control and len(previous_lines) and previous_lines[-1] == line:
+        return
+
+    if "erasedups" in control:
+        _erase(line)
+
+    _append(line)
+
+
+def _append(line: str):
+    previous_lines.append(line)
+
+    absolute = previous_lines.total - 1
+    if len(index) == absolute:
+        index.add(absolute, line)
+
+    if len(prefixes) == absolute:
+        prefixes.add(absolute, line)
+
+    _trim()
+
+
+def _erase(line: str):
+    for absolute in list(previous_lines.find(line)):
+        previous_lines.erase(absolute)
+
+
+def _append_shared(line: str, control):
+    global last_append_index, file_offset
+
+    path = os.environ.get(FILE_ENVVAR)
+    if not path:
+        _add_controlled(line, control)
+        return
+
+    fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o600)
+
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        _read_new_lines(fd)
+
+        total = previous_lines.total
+        _add_controlled(line, control)
+
+        if previous_lines.total != total:
+            file_offset += os.write(fd, (line + "\n").encode())
+            last_append_index = previous_lines.total
+    finally:
+        os.close(fd)
+
+
+def _read_new_lines(fd: int):
+    global file_inode, file_offset
+
+    stat = os.fstat(fd)
+
+    if stat.st_ino != file_inode:
+        # replaced by a writer outside the shared sessions, what it kept cannot be told apart from what was already read
+        file_offset = stat.st_size if file_inode is not None else 0
+        file_inode = stat.st_ino
+
+    if stat.st_size <= file_offset:
+        file_offset = stat.st_size
+        return
+
+    data = os.pread(fd, stat.st_size - file_offset, file_offset)
+    data = data[:data.rfind(b"\n") + 1]
+
+    for line in data.split(b"\n"):
+        if line:
+            _append(line.decode(errors="replace"))
+
+    file_offset += len(data)
+
+
+def _join_sessions(path: str):
+    global session_fd
+
+    # every shared session holds this lock, so that the file is only trimmed once nobody reads it by offset any more
+    session_fd = os.open(path + LOCK_SUFFIX, os.O_RDWR | os.O_CREAT, 0o600)
+    fcntl.flock(session_fd, fcntl.LOCK_SH)
+
+
+def _is_last_session(path: str):
+    if session_fd is None:
+        _join_sessions(path)
+
+    try:
+        fcntl.flock(session_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+
+    return True
+
+
+def _truncate_shared(path: str):
+    global session_fd
+
+    limit = _limit(FILE_SIZE_ENVVAR)
+
+    try:
+        if limit is not None and os.path.isfile(path) and _is_last_session(path):
+            _truncate(path, limit)
+    finally:
+        if session_fd is not None:
+            os.close(session_fd)
+            session_fd = None
+
+
+def _truncate(path: str, limit: int):
+    fd = os.open(path, os.O_RDWR)
+
+    try:
+        # in place, the inode stays the one that writers without the session lock have open
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+        mapped = FileLines(path)
+        if len(mapped) <= limit:
+            return
+
+        kept = io.BytesIO()
+        mapped.write_to(kept, len(mapped) - limit, len(mapped))
+
+        os.pwrite(fd, kept.getvalue(), 0)
+        os.ftruncate(fd, len(kept.getvalue()))
+    finally:
+        os.close(fd)
+
+
+def _replace(path: str, write_to):
+    # through a new file, so that a crash halfway leaves the old one, in place of what a symlink points to and with its mode
+    path = os.path.realpath(path)
+
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = None
+
+    with tempfile.NamedTemporaryFile("wb", dir=os.path.dirname(path), delete=False) as fd:
+        write_to(fd)
+
+        if mode is not None:
+            os.fchmod(fd.fileno(), mode)
+
+    os.replace(fd.name, path)
+
+
+def _trim():
+    limit = _limit(SIZE_ENVVAR)
+    if limit is not None:
+        previous_lines.trim(limit)
+
+    # pruned once as many entries were dropped as are kept, so each drop costs a constant share of a walk
+    dropped = previous_lines.dropped
+    for entries in (index, prefixes):
+        if dropped - entries.oldest > len(previous_lines):
+            entries.prune(dropped)
+
+
+def index_pending(count: int = INDEX_STEP):
+    start = max(len(index), previous_lines.dropped)
+    end = min(start + count, previous_lines.total)
+
+    for absolute in range(start, end):
+        index.add(absolute, previous_lines.get(absolute))
+
+    return end < previous_lines.total
+
+
+def _update_prefixes():
+    # suggestions only look back over recent entries, so a large mapped HISTFILE is not walked on the first keystroke
+    start = max(len(prefixes), previous_lines.dropped, previous_lines.total - SUGGESTION_DEPTH)
+
+    for absolute in range(start, previous_lines.total):
+        prefixes.add(absolute, previous_lines.get(absolute))
+
+
+def _is_shared():
+    return os.environ.get(SHARE_ENVVAR, "") not in ("", "0")
+
+
+def _control():
+    value = os.environ.get(CONTROL_ENVVAR, "")
+    control = set(value.split(":"))
+
+    if "ignoreboth" in control:
+        control.update(("ignorespace", "ignoredups"))
+
+    return control
+
+
+def _limit(name: str):
+    value = os.environ.get(name)
+
+    if value is None or not value.isdigit():
+        return None
+
+    return int(value)
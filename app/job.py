@@ -1,60 +1,357 @@
+import contextlib
 import os
-from dataclasses import dataclass
-from typing import List
+import select
+import signal
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+STOP_SIGNALS = (signal.SIGSTOP, signal.SIGTSTP, signal.SIGTTIN, signal.SIGTTOU)
 
 
 @dataclass
 class RunningJob:
     number: int
-    pid: int
+    pids: List[int]
     command: str
+    group: int = 0
+    is_stopped: bool = False
+    statuses: Dict[int, int] = field(default_factory=dict)
+    usages: Dict[int, "os.struct_rusage"] = field(default_factory=dict)
+    signals: Dict[int, int] = field(default_factory=dict)
+
+    @property
+    def pid(self):
+        return self.pids[-1]
+
+    @property
+    def is_done(self):
+        return len(self.statuses) == len(self.pids)
+
+    @property
+    def status(self):
+        return self.statuses.get(self.pid, 0)
+
+
+running: Dict[int, RunningJob] = {}
+by_pid: Dict[int, RunningJob] = {}
+finished: List[RunningJob] = []
+
+wakeup_fd: Optional[int] = None
 
+# nesting depth of deferred_reaping, and whether a SIGCHLD arrived meanwhile
+_deferred = 0
+_is_reap_pending = False
 
-running: List[RunningJob] = []
 
+def initialize():
+    global wakeup_fd
 
-def add(pid: int, command: str):
-    last_number = running[-1].number if running else 0
-    next_number = last_number + 1
+    read_fd, write_fd = os.pipe()
+    os.set_blocking(read_fd, False)
+    os.set_blocking(write_fd, False)
 
-    running.append(RunningJob(next_number, pid, command))
+    # the read end wakes up the line editor, so that a finished job is reported while typing
+    signal.set_wakeup_fd(write_fd, warn_on_full_buffer=False)
+    signal.signal(signal.SIGCHLD, _on_child)
 
-    print(f"[{next_number}] {pid}")
+    wakeup_fd = read_fd
+
+
+def add(pids: List[int], command: str, group: int = 0):
+    job = RunningJob(0, pids, command, group or pids[0])
+    _register(job)
+
+    print(f"[{job.number}] {job.pid}")
+
+    return job
 
 
 def remove(pid: int):
-    for index, job in enumerate(running):
-        if job.pid == pid:
-            running.pop(index)
-            break
-
-
-def reap(print_running=False):
-    most_recent_index = len(running) - 1
-    previous_index = most_recent_index - 1
-
-    indices_to_remove = []
-
-    for index, job in enumerate(running):
-        symbol = " "
-        if index == most_recent_index:
-            symbol = "+"
-        elif index == previous_index:
-            symbol = "-"
-
-        status = "Running"
-        if not _is_running(job.pid):
-            status = "Done"
-            indices_to_remove.append(index)
-        elif not print_running:
+    job = by_pid.get(pid)
+    if job is None:
+        return
+
+    _unregister(job)
+
+
+def find(spec: str) -> Optional[RunningJob]:
+    if spec in ("%", "%%", "%+"):
+        return running[next(reversed(running))] if running else None
+
+    if spec == "%-":
+        numbers = list(running.keys())
+        return running[numbers[-2]] if len(numbers) > 1 else None
+
+    if spec.startswith("%") and spec[1:].isdigit():
+        return running.get(int(spec[1:]))
+
+    if spec.isdigit():
+        return by_pid.get(int(spec))
+
+    return None
+
+
+@contextlib.contextmanager
+def deferred_reaping():
+    # a reaped job takes its process group with it, and the terminal can't be handed to a group that is gone
+    global _deferred, _is_reap_pending
+
+    previous = signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGCHLD})
+    _deferred += 1
+
+    try:
+        yield
+    finally:
+        _deferred -= 1
+        signal.pthread_sigmask(signal.SIG_SETMASK, previous)
+
+        if not _deferred and _is_reap_pending:
+            _is_reap_pending = False
+            _reap()
+
+
+def foreground(job: RunningJob):
+    job.is_stopped = False
+
+    with deferred_reaping(), _terminal(job):
+        # reaped below instead of by the handler, so that a stop is seen too
+        _unregister(job)
+
+        for pid in job.pids:
+            if pid in job.statuses:
+                continue
+
+            _, status, usage = os.wait4(pid, os.WUNTRACED)
+
+            if os.WIFSTOPPED(status):
+                job.is_stopped = True
+                _register(job)
+
+                print()
+                _print(job, _symbol(job), None)
+                return False
+
+            _store(job, pid, status, usage)
+
+    if 128 + signal.SIGINT in job.statuses.values():
+        print()
+
+    return True
+
+
+def background(job: RunningJob, file=None):
+    job.is_stopped = False
+    _continue(job)
+
+    print(f"[{job.number}]{_symbol(job)} {job.command} &", file=file)
+
+
+def kill(job: RunningJob, number: int):
+    os.killpg(job.group, number)
+
+    if number in STOP_SIGNALS:
+        job.is_stopped = True
+    elif job.is_stopped:
+        # a stopped job only acts on the signal once it runs again
+        job.is_stopped = False
+        _continue(job)
+
+
+def wait_job(job: RunningJob):
+    _block_until(lambda: job.is_done or job.is_stopped)
+
+    if job.is_stopped:
+        return 128 + signal.SIGTSTP
+
+    _unregister(job)
+    return job.status
+
+
+def wait_all():
+    jobs = list(running.values())
+    _block_until(lambda: all(job.is_done or job.is_stopped for job in jobs))
+
+    for job in jobs:
+        if job.is_done:
+            _unregister(job)
+
+
+def wait_next() -> Optional[int]:
+    if not any(not job.is_stopped for job in running.values()):
+        return None
+
+    _block_until(lambda: any(job.number in running for job in finished))
+
+    job = next(job for job in finished if job.number in running)
+    finished.remove(job)
+
+    _unregister(job)
+    return job.status
+
+
+def exit_code(status: int):
+    code = os.waitstatus_to_exitcode(status)
+
+    # killed by a signal, reported the way other shells do
+    if code < 0:
+        return 128 - code
+
+    return code
+
+
+def notify(file=None):
+    global finished
+
+    # swapped rather than copied and cleared, a job the handler finishes in between lands in the new list
+    reported, finished = finished, []
+
+    for job in reported:
+        if job.number in running:
+            _print(job, _symbol(job), file)
+            remove(job.pid)
+
+    return len(reported)
+
+
+def reap(print_running=False, file=None, is_listing_only=False):
+    if not is_listing_only:
+        finished.clear()
+
+    for job in list(running.values()):
+        if not job.is_done and not print_running:
             continue
 
-        print(f"[{job.number}]{symbol}  {status:<20} {job.command}")
+        _print(job, _symbol(job), file)
+
+        if job.is_done and not is_listing_only:
+            remove(job.pid)
+
+
+def _symbol(job: RunningJob):
+    numbers = list(running.keys())
+
+    if job.number == numbers[-1]:
+        return "+"
+
+    if len(numbers) > 1 and job.number == numbers[-2]:
+        return "-"
+
+    return " "
+
+
+def _print(job: RunningJob, symbol: str, file):
+    status = "Stopped" if job.is_stopped else "Running"
+
+    if job.is_done:
+        if job.pid in job.signals:
+            status = signal.strsignal(job.signals[job.pid]) or f"Signal {job.signals[job.pid]}"
+        else:
+            status = "Done" if job.status == 0 else f"Exit {job.status}"
+
+    print(f"[{job.number}]{symbol}  {status:<20} {job.command}", file=file)
+
+
+def _register(job: RunningJob):
+    if not job.number:
+        job.number = max(running, default=0) + 1
+
+    running[job.number] = job
+
+    for pid in job.pids:
+        if pid in job.statuses:
+            continue
+
+        by_pid[pid] = job
+
+
+def _unregister(job: RunningJob):
+    running.pop(job.number, None)
+
+    for pid in job.pids:
+        by_pid.pop(pid, None)
+
+
+@contextlib.contextmanager
+def _terminal(job: RunningJob):
+    is_terminal = os.isatty(0)
+    if is_terminal:
+        try:
+            os.tcsetpgrp(0, job.group)
+        except (ProcessLookupError, PermissionError):
+            # every member was reaped already, there is nothing to hand the terminal to
+            is_terminal = False
+
+    # resumes a stopped job, and a stage that touched the terminal before the hand-over was stopped with SIGTTIN
+    _continue(job)
+
+    try:
+        yield
+    finally:
+        # SIGTTOU is ignored by main, the shell is in the background at this point
+        if is_terminal:
+            os.tcsetpgrp(0, os.getpgrp())
+
+
+def _continue(job: RunningJob):
+    try:
+        os.killpg(job.group, signal.SIGCONT)
+    except ProcessLookupError:
+        pass
+
+
+def _block_until(predicate):
+    while not predicate():
+        # _on_child runs before select returns, the wakeup byte only ends the wait
+        select.select([wakeup_fd], [], [])
+        _drain()
+
+
+def _drain():
+    try:
+        while os.read(wakeup_fd, 4096):
+            pass
+    except BlockingIOError:
+        pass
+
+
+def _on_child(signum, frame):
+    global _is_reap_pending
+
+    # the mask only holds the signal back from this thread, another one can still take it and have the handler run here
+    if _deferred:
+        _is_reap_pending = True
+        return
+
+    _reap()
+
+
+def _reap():
+    while True:
+        try:
+            pid, status, usage = os.wait4(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+
+        if pid == 0:
+            return
+
+        # any other child is a Popen of a completion handler, which takes a child reaped here as exited with 0, and
+        # nothing reads that status
+        job = by_pid.get(pid)
+        if job is not None:
+            _record(job, pid, status, usage)
+
+
+def _record(job: RunningJob, pid: int, status: int, usage):
+    _store(job, pid, status, usage)
+
+    if job.is_done:
+        finished.append(job)
 
-    for index in reversed(indices_to_remove):
-        running.pop(index)
 
+def _store(job: RunningJob, pid: int, status: int, usage):
+    job.statuses[pid] = exit_code(status)
+    job.usages[pid] = usage
 
-def _is_running(pid):
-    pid, _ = os.waitpid(pid, os.WNOHANG)
-    return pid == 0
+    if os.WIFSIGNALED(status):
+        job.signals[pid] = os.WTERMSIG(status)
@@ -0,0 +1,344 @@
+import bisect
+import os
+import re
+from array import array
+from collections import OrderedDict
+from typing import BinaryIO, List, Tuple, Union
+
+BLOCK_SIZE = 64 * 1024
+CACHED_BLOCKS = 8
+WRITE_CHUNK_SIZE = 1024 * 1024
+
+EMPTY_LINE_PATTERN = re.compile(rb"(?<![^\n])\n")
+
+
+class FileLines:
+
+    def __init__(self, path: str):
+        # read with pread rather than mapped, a file that another process truncates reads short instead of faulting
+        self._file = open(path, "rb", buffering=0)
+
+        stat = os.fstat(self._file.fileno())
+        self.inode = stat.st_ino
+        self.size = stat.st_size
+
+        self._starts = array("Q")
+        self._counts = array("Q")
+        self._length = 0
+
+        self._blocks: "OrderedDict[int, Tuple[List[bytes], List[int]]]" = OrderedDict()
+
+        position = 0
+        while position < self.size:
+            data = self._read(position, BLOCK_SIZE)
+
+            # a line longer than a block
+            while position + len(data) < self.size and b"\n" not in data:
+                more = self._read(position + len(data), BLOCK_SIZE)
+                if not more:
+                    break
+
+                data += more
+
+            if position + len(data) < self.size:
+                data = data[:data.rfind(b"\n") + 1]
+
+            if not data:
+                break
+
+            self._starts.append(position)
+            self._counts.append(self._length)
+            self._length += _count_entries(data)
+
+            position += len(data)
+
+        self._starts.append(position)
+        self._counts.append(self._length)
+
+        self.size = position
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index: int):
+        lines, _ = self._locate(index)
+        return lines[index - self._counts[self._block_of(index)]].decode(errors="replace")
+
+    def write_to(self, stream: BinaryIO, start: int, end: int):
+        end = min(end, self._length)
+        if start >= end:
+            return
+
+        position = self._position_of(start)
+        stop = self._position_of(end) if end < self._length else self.size
+
+        last = b"\n"
+        while position < stop:
+            chunk = self._read(position, min(WRITE_CHUNK_SIZE, stop - position))
+            if not chunk:
+                break
+
+            stream.write(chunk)
+            position += len(chunk)
+            last = chunk[-1:]
+
+        if last != b"\n":
+            stream.write(b"\n")
+
+    def find(self, line: str):
+        needle = line.encode()
+        found = []
+
+        for block in range(len(self._starts) - 1):
+            data = self._read(self._starts[block], self._starts[block + 1] - self._starts[block])
+
+            for position in _find_lines(data, needle):
+                found.append(self._index_at(self._starts[block] + position))
+
+        return found
+
+    def _read(self, position: int, length: int):
+        return os.pread(self._file.fileno(), length, position)
+
+    def _index_at(self, position: int):
+        block = bisect.bisect_right(self._starts, position) - 1
+        _, positions = self._block(block)
+
+        return self._counts[block] + bisect.bisect_left(positions, position)
+
+    def _position_of(self, index: int):
+        _, positions = self._locate(index)
+        return positions[index - self._counts[self._block_of(index)]]
+
+    def _block_of(self, index: int):
+        return bisect.bisect_right(self._counts, index) - 1
+
+    def _locate(self, index: int):
+        if not 0 <= index < self._length:
+            raise IndexError(index)
+
+        return self._block(self._block_of(index))
+
+    def _block(self, block: int):
+        cached = self._blocks.get(block)
+        if cached is not None:
+            self._blocks.move_to_end(block)
+            return cached
+
+        lines: List[bytes] = []
+        positions: List[int] = []
+
+        position = self._starts[block]
+        for line in self._read(position, self._starts[block + 1] - position).split(b"\n"):
+            if line:
+                lines.append(line)
+                positions.append(position)
+
+            position += len(line) + 1
+
+        # shrunk by another process since it was counted, what was cut off reads as empty
+        missing = self._counts[block + 1] - self._counts[block] - len(lines)
+        lines += [b""] * missing
+        positions += [self._starts[block + 1]] * missing
+
+        self._blocks[block] = (lines, positions)
+        if len(self._blocks) > CACHED_BLOCKS:
+            self._blocks.popitem(last=False)
+
+        return lines, positions
+
+
+class CompactLines:
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._offsets = array("Q", [0])
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+
+        return self._buffer[self._offsets[index]:self._offsets[index + 1] - 1].decode(errors="replace")
+
+    def find(self, line: str):
+        return [
+            bisect.bisect_right(self._offsets, position) - 1
+            for position in _find_lines(self._buffer, line.encode())
+        ]
+
+    def append(self, line: str):
+        self._buffer += line.encode()
+        self._buffer += b"\n"
+        self._offsets.append(len(self._buffer))
+
+    def drop_front(self, count: int):
+        shift = self._offsets[count]
+
+        del self._buffer[:shift]
+        self._offsets = array("Q", (offset - shift for offset in self._offsets[count:]))
+
+    def write_to(self, stream: BinaryIO, start: int, end: int):
+        end = min(end, len(self))
+        if start < end:
+            stream.write(memoryview(self._buffer)[self._offsets[start]:self._offsets[end]])
+
+
+class Lines:
+
+    def __init__(self):
+        self._segments: List[Union[FileLines, CompactLines]] = []
+        self._bases: List[int] = []
+        self._total = 0
+        self._dropped = 0
+        self._erased: List[int] = []
+
+    def __len__(self):
+        return self._total - self._dropped - len(self._erased)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+
+        return self.get(self.absolute_of(index))
+
+    @property
+    def total(self):
+        return self._total
+
+    @property
+    def dropped(self):
+        return self._dropped
+
+    def get(self, absolute: int):
+        segment = bisect.bisect_right(self._bases, absolute) - 1
+        return self._segments[segment][absolute - self._bases[segment]]
+
+    def absolute_of(self, index: int):
+        absolute = index + self._dropped
+
+        while True:
+            candidate = index + self._dropped + bisect.bisect_right(self._erased, absolute)
+            if candidate == absolute:
+                return absolute
+
+            absolute = candidate
+
+    def index_of(self, absolute: int):
+        return absolute - self._dropped - bisect.bisect_left(self._erased, absolute)
+
+    def is_live(self, absolute: int):
+        if not self._dropped <= absolute < self._total:
+            return False
+
+        position = bisect.bisect_left(self._erased, absolute)
+        return position == len(self._erased) or self._erased[position] != absolute
+
+    def append(self, line: str):
+        if not self._segments or not isinstance(self._segments[-1], CompactLines):
+            self._add_segment(CompactLines())
+
+        self._segments[-1].append(line)
+        self._total += 1
+
+    def extend(self, lines: FileLines):
+        if len(lines):
+            self._add_segment(lines)
+            self._total += len(lines)
+
+    def find(self, line: str):
+        for segment, base in zip(self._segments, self._bases):
+            for index in segment.find(line):
+                if self.is_live(base + index):
+                    yield base + index
+
+    def erase(self, absolute: int):
+        if self.is_live(absolute):
+            bisect.insort(self._erased, absolute)
+
+    def trim(self, maximum: int):
+        excess = len(self) - max(maximum, 0)
+        if excess <= 0:
+            return
+
+        self._dropped = self.absolute_of(excess) if excess < len(self) else self._total
+        del self._erased[:bisect.bisect_left(self._erased, self._dropped)]
+
+        while self._segments and self._bases[0] + len(self._segments[0]) <= self._dropped:
+            self._segments.pop(0)
+            self._bases.pop(0)
+
+        if self._segments and isinstance(self._segments[0], CompactLines):
+            first = self._segments[0]
+            unused = self._dropped - self._bases[0]
+
+            if unused > len(first) // 2:
+                first.drop_front(unused)
+                self._bases[0] += unused
+
+    def write_to(self, stream: BinaryIO, start: int = 0):
+        if start >= len(self):
+            return
+
+        first = self.absolute_of(start)
+
+        for erased in self._erased[bisect.bisect_left(self._erased, first):]:
+            self._write_range(stream, first, erased)
+            first = erased + 1
+
+        self._write_range(stream, first, self._total)
+
+    def _write_range(self, stream: BinaryIO, first: int, end: int):
+        for segment, base in zip(self._segments, self._bases):
+            if first < base + len(segment) and base < end:
+                segment.write_to(stream, max(first - base, 0), end - base)
+
+    def _add_segment(self, segment: Union[FileLines, CompactLines]):
+        self._bases.append(self._total)
+        self._segments.append(segment)
+
+
+def _find_lines(data, needle: bytes):
+    # whole lines only, searched in the raw bytes so that nothing has to be decoded
+    if not needle:
+        return
+
+    position = data.find(needle)
+
+    while position != -1:
+        end = position + len(needle)
+
+        if (position == 0 or data[position - 1] == 0x0a) and (end == len(data) or data[end] == 0x0a):
+            yield position
+
+        position = data.find(needle, end)
+
+
+def _count_entries(block: bytes):
+    count = block.count(b"\n")
+
+    if block and not block.endswith(b"\n"):
+        count += 1
+
+    if block.startswith(b"\n") or b"\n\n" in block:
+        count -= len(EMPTY_LINE_PATTERN.findall(block))
+
+    return count
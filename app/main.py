@@ -1,48 +1,80 @@
+import collections
 import os
+import signal
 import sys
 import termios
+import time
 import tty
 import typing
 
-from . import completer, history, job, parser, run
+from . import candidates, completer, completion, database, editor, executable, history, job, parser, run, terminal
+from .candidates import Candidates
 from .command import BUILTINS
 
-UP = "A"
-DOWN = "B"
+PROMPT = "$ "
 
+BUILTIN_CANDIDATES = Candidates(BUILTINS.keys())
 
-def _write_and_flush(data: str):
-    sys.stdout.write(data)
-    sys.stdout.flush()
+_reader: typing.Optional[terminal.KeyReader] = None
+_queued_lines: typing.Deque[str] = collections.deque()
+_accepted_line = ""
 
 
-def _find_shared_prefix(candidates: typing.List[str]):
-    candidates = sorted(candidates, key=lambda x: (len(x), x))
+def _write(data: str):
+    terminal.write(data)
 
-    first, *others = candidates
 
-    end = 0
-    for end in range(1, len(first) + 1):
-        for other in others:
-            other = other[:end]
+def _list_directory(directory: str):
+    names = []
 
-            if not first.startswith(other):
-                break
-        else:
-            continue
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if os.path.isdir(path):
+            name += "/"
+
+        names.append(name)
+
+    return Candidates(names)
 
-        end -= 1
-        break
 
-    return first[:end] or None
+def _gather_sources(command: str, line: str, prefix: str, directory: str, is_command: bool):
+    sources = []
+
+    tasks = {
+        ("directory", directory): lambda: _list_directory(directory),
+    }
+
+    if is_command:
+        tasks[("path",)] = executable.candidates
+
+    if completer.get_handler(command):
+        deadline = time.monotonic() + completion.timeout()
+
+        tasks[("completer", command, line)] = lambda: Candidates(
+            candidate
+            for candidate in completer.collect(command, line, deadline) or ()
+            if candidate != prefix
+        )
+
+    gathered = completion.gather(tasks)
+
+    if is_command:
+        sources.append(BUILTIN_CANDIDATES)
+        sources.append(gathered.results.get(("path",), Candidates()))
+
+    completer_candidates = gathered.results.get(("completer", command, line))
+    if completer_candidates:
+        sources.append(completer_candidates)
+    else:
+        sources.append(gathered.results.get(("directory", directory), Candidates()))
+
+    return sources, gathered.partial
 
 
 def autocomplete(line: str, bell_rang: bool):
     if not line:
         return ""
 
-    candidates = set()
-
     first_space_index = line.find(" ")
     command = line if first_space_index == -1 else line[:first_space_index]
 
@@ -64,107 +96,85 @@ def autocomplete(line: str, bell_rang: bool):
         parent = os.path.normpath(os.path.join(os.getcwd(), os.path.dirname(beginning)))
         prefix = os.path.basename(beginning)
 
-    if is_command:
-        for name in BUILTINS.keys():
-            if name.startswith(prefix):
-                candidates.add(name[len(prefix):])
-
-        paths = os.environ.get("PATH", "").split(":")
-        for path in paths:
-            if not os.path.isdir(path):
-                continue
-
-            for file_name in os.listdir(path):
-                if not file_name.startswith(prefix):
-                    continue
-
-                file_path = os.path.join(path, file_name)
-                if not os.path.isfile(file_path) or not os.access(file_path, os.X_OK):
-                    continue
+    directory = parent or os.getcwd()
 
-                candidates.add(file_name[len(prefix):])
+    key = (
+        line,
+        os.getcwd(),
+        os.environ.get(executable.PATH_ENVVAR),
+        completer.get_handler(command),
+        completer.is_persistent(command),
+    )
 
-    completer_candidates = completer.collect(command, line)
-    if completer_candidates:
-        for candidate in completer_candidates:
-            if candidate.startswith(prefix):
-                candidate = candidate[len(prefix):]
+    sources = completion.cache.get(key)
+    partial = False
 
-                if candidate:
-                    candidates.add(candidate)
+    if sources is None:
+        sources, partial = _gather_sources(command, line, prefix, directory, is_command)
 
-    else:
-        directory = parent or os.getcwd()
+        if not partial:
+            directories = [directory]
+            if is_command:
+                directories.extend(executable.path_directories())
 
-        for name in os.listdir(directory):
-            if not name.startswith(prefix):
-                continue
+            completion.cache.put(key, sources, directories)
 
-            path = os.path.join(directory, name)
-            if os.path.isdir(path):
-                name += "/"
-
-            candidates.add(name[len(prefix):])
-
-    candidates = sorted(candidates)
-    if not candidates:
+    completed = candidates.complete(prefix, *sources)
+    if completed.is_empty:
         return None  # trigger the bell by mistake, but that fine
 
-    if len(candidates) == 1:
-        candidate = candidates[0]
+    if completed.is_unique:
+        candidate = completed.shared_prefix()[len(prefix):]
 
-        if candidate.endswith("/"):
-            return candidate
+        # a late source may still add candidates, do not close the word yet
+        if candidate.endswith("/") or partial:
+            return candidate or None
 
         return f"{candidate} "
 
-    shared_prefix = _find_shared_prefix(candidates)
-    if shared_prefix is not None:
+    shared_prefix = completed.shared_prefix()[len(prefix):]
+    if shared_prefix:
         return shared_prefix
 
     if bell_rang:
-        sys.stdout.write("\n")
+        _write("\n")
 
-        for index, candidate in enumerate(sorted(candidates)):
+        for index, candidate in enumerate(completed.matches()):
             if index != 0:
-                sys.stdout.write("  ")
+                _write("  ")
 
-            sys.stdout.write(beginning)
-            sys.stdout.write(candidate)
+            _write(beginning)
+            _write(candidate[len(prefix):])
 
-        sys.stdout.write("\n")
+        _write("\n")
 
         prompt()
 
-        _write_and_flush(line)
+        _write(terminal.display(line))
 
     return None
 
 
 def prompt():
-    _write_and_flush("$ ")
+    _write(PROMPT)
 
 
 def read():
-    line = ""
-
-    history_length = len(history.previous_lines)
-    history_position = history_length
+    global _reader
 
-    def change_line(new_line: str):
-        nonlocal line
-        _write_and_flush("\r" + " " * (len(line) + 2) + "\r")
+    if _queued_lines:
+        return _accept(_queued_lines.popleft())
 
-        prompt()
+    line = editor.LineEditor(_write, len(PROMPT))
 
-        line = new_line
-        _write_and_flush(line)
+    history_length = len(history.previous_lines)
+    history_position = history_length
 
     def up_history():
         nonlocal history_position
         if history_position != 0:
             history_position -= 1
-            change_line(history.previous_lines[history_position])
+            line.replace(history.previous_lines[history_position])
 
     def down_history():
         nonlocal history_position
@@ -172,9 +182,84 @@ def read():
             history_position += 1
 
             if history_position == history_length:
-                change_line("")
+                line.replace("")
             else:
-                change_line(history.previous_lines[history_position])
+                line.replace(history.previous_lines[history_position])
+
+    search_query: typing.Optional[str] = None
+    search_stack: typing.List[typing.Tuple[str, typing.Optional[int]]] = []
+    search_original = ""
+
+    def show_search():
+        match = search_stack[-1][1]
+        matched_line = history.previous_lines[match] if match is not None else ""
+        status = "reverse-i-search" if match is not None or not search_query else "failed reverse-i-search"
+
+        _write(f"\r({status})`{terminal.display(search_query)}': {terminal.display(matched_line)}{editor.CLEAR_TO_END}")
+
+    def start_search():
+        nonlocal search_query, search_original
+        search_query = ""
+        search_original = line.text
+        search_stack.clear()
+        search_stack.append(("", None))
+
+        show_search()
+
+    def extend_search(text: str):
+        nonlocal search_query
+        match = search_stack[-1][1]
+
+        search_query += text
+        before = match + 1 if match is not None else None
+        search_stack.append((search_query, history.search(search_query, before)))
+
+        show_search()
+
+    def older_search():
+        match = search_stack[-1][1]
+
+        if match is not None:
+            older = history.search(search_query, match)
+            if older is not None:
+                search_stack.append((search_query, older))
+
+        show_search()
+
+    def shrink_search():
+        nonlocal search_query
+        if len(search_stack) > 1:
+            search_stack.pop()
+
+        search_query = search_stack[-1][0]
+        show_search()
+
+    def stop_search(accept: bool):
+        nonlocal search_query
+        match = search_stack[-1][1]
+
+        if accept and match is not None:
+            text = history.previous_lines[match]
+        else:
+            text = search_original
+
+        search_query = None
+        line.redraw(PROMPT, text)
+
+    def notify_jobs():
+        if search_query is not None:
+            _write("\r" + editor.CLEAR_TO_END)
+        else:
+            line.clear()
+
+        terminal.flush()
+
+        job.notify()
+
+        if search_query is not None:
+            show_search()
+        else:
+            line.redraw(PROMPT)
 
     prompt()
 
@@ -182,83 +267,196 @@ def read():
     previous = termios.tcgetattr(stdin_fd)
     tty.setcbreak(stdin_fd, termios.TCSANOW)
 
+    if _reader is None:
+        _reader = terminal.KeyReader(stdin_fd, job.wakeup_fd, history.index_pending)
+
+    _write(terminal.ENABLE_BRACKETED_PASTE)
+
     try:
         bell_rang = False
 
         while True:
-            character = sys.stdin.read(1)
+            if search_query is None:
+                line.suggest((history.suggest(line.text) or "") if line.at_end else "")
+
+            key = _reader.next()
+            if key is None:
+                return None
+
+            if key is terminal.WAKEUP:
+                if job.finished:
+                    notify_jobs()
+
+                continue
+
+            if search_query is not None:
+                match key:
+                    case terminal.REVERSE_SEARCH:
+                        older_search()
+                        continue
+
+                    case terminal.CANCEL:
+                        stop_search(accept=False)
+                        continue
+
+                    case "\x7f":
+                        shrink_search()
+                        continue
+
+                    case terminal.Paste():
+                        extend_search(key)
+                        continue
+
+                    case _ if not key.startswith(terminal.ESCAPE) and key.isprintable():
+                        extend_search(key)
+                        continue
+
+                    case _:
+                        stop_search(accept=True)
+
+            match key:
+                case terminal.REVERSE_SEARCH:
+                    start_search()
+
+                case terminal.Paste():
+                    line.insert(key)
 
-            match character:
                 case "\x04":
-                    if line:
+                    if len(line):
+                        line.delete()
                         continue
 
                     return None
 
                 case "\n":
-                    _write_and_flush("\n")
+                    line.suggest("")
+                    line.end()
+                    _write("\n")
                     break
 
                 case "\t":
-                    autocompleted = autocomplete(line, bell_rang)
+                    line.end()
+                    line.suggest("")
+                    autocompleted = autocomplete(line.text, bell_rang)
 
                     if autocompleted:
-                        line += autocompleted
-                        _write_and_flush(autocompleted)
+                        line.insert(autocompleted)
                     else:
-                        _write_and_flush("\a")
+                        _write("\a")
                         bell_rang = True
 
-                case "\x1b":
-                    sys.stdin.read(1)  # '['
-                    direction = sys.stdin.read(1)  # 'A' or 'B' or 'C' or 'D'
-
-                    if direction == UP and history_position != 0:
+                case terminal.UP:
+                    if history_position != 0:
                         up_history()
-                    elif direction == DOWN:
-                        down_history()
+
+                case terminal.DOWN:
+                    down_history()
+
+                case terminal.LEFT:
+                    line.left()
+
+                case terminal.RIGHT if line.suggestion:
+                    line.accept_suggestion()
+
+                case terminal.RIGHT:
+                    line.right()
+
+                case _ if key in terminal.HOME_KEYS:
+                    line.home()
+
+                case _ if key in terminal.END_KEYS:
+                    if line.suggestion:
+                        line.accept_suggestion()
+                    else:
+                        line.end()
+
+                case _ if key in terminal.WORD_LEFT_KEYS:
+                    line.word_left()
+
+                case _ if key in terminal.WORD_RIGHT_KEYS:
+                    line.word_right()
+
+                case terminal.DELETE:
+                    line.delete()
 
                 case "\x7f":
-                    if not line:
+                    if not line.backspace():
                         continue
 
-                    line = line[:-1]
-                    _write_and_flush("\b \b")
-
                     bell_rang = False
 
+                case _ if key.startswith(terminal.ESCAPE):
+                    pass
+
                 case _:
-                    line += character
-                    _write_and_flush(character)
+                    line.insert(key)
     except KeyboardInterrupt:
-        _write_and_flush("\n")
+        line.suggest("")
+        line.end()
+        _write("\n")
         return []
     finally:
+        _write(terminal.DISABLE_BRACKETED_PASTE)
+        terminal.flush()
         termios.tcsetattr(stdin_fd, termios.TCSANOW, previous)
 
+    line, *others = line.text.split("\n")
+    _queued_lines.extend(others)
+
+    return _accept(line)
+
+
+def _accept(line: str):
+    global _accepted_line
+
     if not len(line):
         return []
 
     history.add_line(line)
-    return parser.LineParser(line).parse()
+    _accepted_line = line
+
+    return parser.parse(line)
 
 
 def eval(
     commands: typing.List[parser.Command]
 ):
+    cwd = os.getcwd()
+    started = time.time()
+    start = time.monotonic()
+
+    shell_exit_code = None
     if len(commands) == 1:
-        return run.single(commands[0])
+        shell_exit_code = run.single(commands[0])
     else:
         run.pipeline(commands)
 
+    database.record(database.Record(
+        _accepted_line,
+        started,
+        time.monotonic() - start,
+        run.last_status,
+        cwd,
+        len(commands),
+    ))
+
+    return shell_exit_code
+
 
 def main():
+    # lets the shell take the terminal back from a finished foreground pipeline
+    signal.signal(signal.SIGTTOU, signal.SIG_IGN)
+    signal.signal(signal.SIGWINCH, terminal.on_resize)
+    job.initialize()
+
     history.initialize()
+    database.initialize()
 
     shell_exit_code = None
 
     while True:
-        job.reap()
+        job.notify()
+        history.synchronize()
 
         commands = read()
 
@@ -273,6 +471,8 @@ def main():
             break
 
     history.destroy()
+    database.destroy()
+    completer.destroy()
 
     if shell_exit_code is not None:
         exit(shell_exit_code)
@@ -1,9 +1,10 @@
+import re
 from abc import ABC
+from collections import OrderedDict
 from dataclasses import dataclass
 from enum import Enum
-from functools import cached_property
 from io import StringIO
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
 from . import variable
 
@@ -18,6 +19,21 @@ AMPERSAND = "&"
 DOLLAR = "$"
 BRACE_OPEN = "{"
 BRACE_CLOSE = "}"
+CACHE_CAPACITY = 256
+EXPANSION_CAPACITY = 4096
+
+# generation of an expansion that does not depend on any variable
+CONSTANT = -1
+
+# runs of characters that need no special handling, copied in one slice
+PLAIN_PATTERN = re.compile(r"(?:[^ '\"\\>|$&\0\d]|\d(?!>))+")
+SINGLE_QUOTED_PATTERN = re.compile(r"[^'\0]*")
+DOUBLE_QUOTED_PATTERN = re.compile(r'[^"\\\0]*')
+VARIABLE_PATTERN = re.compile(r"\{(?P<braced>\?|\w*)\}?|(?P<name>\?|\w*)")
+
+
+# by node identity, the nodes themselves stay immutable, and each entry keeps its node alive so that the id is not reused
+_expansions: Dict[int, tuple] = {}
 
 
 class StandardNamedStream(Enum):
@@ -35,16 +51,30 @@ class StandardNamedStream(Enum):
         return StandardNamedStream.UNKNOWN
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Redirect:
     stream_name: StandardNamedStream
-    path: "Argument"
+    path: Optional["Argument"]
     append: bool
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Argument:
-    parts: List["ArgumentPart"]
+    parts: Tuple["ArgumentPart", ...]
+
+    @property
+    def is_constant(self):
+        return all(isinstance(part, LiteralPart) for part in self.parts)
+
+    def expand(self, variables: variable.Store):
+        entry = _expansions.get(id(self))
+        if entry is not None and entry[0] is self and entry[1] in (CONSTANT, variables.generation):
+            return entry[2]
+
+        resolved = self.resolve(variables)
+        _remember(self, CONSTANT if self.is_constant else variables.generation, resolved)
+
+        return resolved
 
     def resolve(self, variables: Dict[str, str]):
         builder = StringIO()
@@ -67,44 +97,109 @@ class Argument:
         return resolved
 
     def __str__(self):
-        return self.resolve(variable.store)
+        return self.expand(variable.store)
 
 
 class ArgumentPart(ABC):
-    ...
+    __slots__ = ()
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class LiteralPart(ArgumentPart):
     value: str
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class VariablePart(ArgumentPart):
     name: str
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Command:
-    raw_arguments: List[Argument]
-    redirects: List[Redirect]
+    raw_arguments: Tuple[Argument, ...]
+    redirects: Tuple[Redirect, ...]
     is_job: bool = False
 
-    @cached_property
+    @property
     def arguments(self):
+        # a copy, the expansion is shared by every later access
+        return list(self._expand())
+
+    @property
+    def program(self):
+        return self._expand()[0]
+
+    def _expand(self):
+        entry = _expansions.get(id(self))
+        if entry is not None and entry[0] is self and entry[1] == variable.store.generation:
+            return entry[2]
+
         resolveds = []
 
         for argument in self.raw_arguments:
-            resolved = argument.resolve(variable.store)
+            resolved = argument.expand(variable.store)
 
             if resolved is not None:
                 resolveds.append(resolved)
 
+        resolveds = tuple(resolveds)
+        _remember(self, variable.store.generation, resolveds)
+
         return resolveds
 
+
+def _remember(node, generation: int, expansion):
+    if len(_expansions) >= EXPANSION_CAPACITY:
+        # mostly nodes the parse cache dropped already, starting over is cheaper than tracking them
+        _expansions.clear()
+
+    _expansions[id(node)] = (node, generation, expansion)
+
+
+class ParseCache:
+
+    def __init__(self, capacity=CACHE_CAPACITY):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: "OrderedDict[str, Tuple[Command, ...]]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
     @property
-    def program(self):
-        return self.arguments[0]
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def parse(self, line: str):
+        commands = self._entries.get(line)
+
+        if commands is not None:
+            self._entries.move_to_end(line)
+            self.hits += 1
+            return commands
+
+        self.misses += 1
+
+        commands = LineParser(line).parse()
+        self._entries[line] = commands
+
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+        return commands
+
+    def clear(self):
+        self._entries.clear()
+
+
+cache = ParseCache()
+
+
+def parse(line: str):
+    return cache.parse(line)
 
 
 class LineParser:
@@ -117,6 +212,7 @@ class LineParser:
         self._arguments: List[ArgumentPart] = []
 
         self._argument_parts: List[ArgumentPart] = []
+        self._literal: List[str] = []
         self._redirects: List[Redirect] = []
         self._is_job = False
 
@@ -127,12 +223,12 @@ class LineParser:
         if self._arguments:
             self._pipe()
 
-        return self._commands
+        return tuple(self._commands)
 
     def next_argument(self):
         while (character := self._next()) != END:
             if character == SPACE:
-                if self._argument_parts:
+                if self._has_parts():
                     return self._to_argument()
             elif character == SINGLE:
                 self._single_quote()
@@ -149,42 +245,58 @@ class LineParser:
             elif character == AMPERSAND:
                 # TODO Reject double ampersand
                 self._is_job = True
+            elif character.isdigit() and self._peek() == GREATER_THAN:
+                self._next()
+                self._redirect(StandardNamedStream.from_fd(int(character)))
             else:
-                if character.isdigit() and self._peek() == GREATER_THAN:
-                    self._next()
-                    self._redirect(StandardNamedStream.from_fd(int(character)))
-                else:
-                    self._append_literal(character)
+                self._plain()
 
-        if self._argument_parts:
+        if self._has_parts():
             return self._to_argument()
 
         return None
 
-    def _append_literal(self, character: str):
-        last_part = self._argument_parts[-1] if self._argument_parts else None
+    def _append_literal(self, text: str):
+        if text:
+            self._literal.append(text)
+
+    def _flush_literal(self):
+        if self._literal:
+            self._argument_parts.append(LiteralPart("".join(self._literal)))
+            self._literal = []
 
-        if isinstance(last_part, LiteralPart):
-            last_part.value += character
-        else:
-            self._argument_parts.append(LiteralPart(character))
+    def _has_parts(self):
+        return bool(self._argument_parts or self._literal)
 
     def _to_argument(self):
-        argument = Argument(self._argument_parts)
+        self._flush_literal()
+
+        argument = Argument(tuple(self._argument_parts))
         self._argument_parts = []
 
         return argument
 
+    def _plain(self):
+        self._index = self._consume(PLAIN_PATTERN, self._index)
+
     def _single_quote(self):
-        while (character := self._next()) != END and character != SINGLE:
-            self._append_literal(character)
+        self._index = self._consume(SINGLE_QUOTED_PATTERN, self._index + 1)
+        self._next()
 
     def _double_quote(self):
-        while (character := self._next()) != END and character != DOUBLE:
-            if character == BACKSLASH:
-                self._backslash(True)
-            else:
-                self._append_literal(character)
+        while True:
+            self._index = self._consume(DOUBLE_QUOTED_PATTERN, self._index + 1)
+
+            if self._next() != BACKSLASH:
+                break
+
+            self._backslash(True)
+
+    def _consume(self, pattern: re.Pattern, start: int):
+        match = pattern.match(self._line, start)
+        self._append_literal(match.group())
+
+        return match.end() - 1
 
     def _backslash(self, in_quote: bool):
         character = self._next()
@@ -221,12 +333,12 @@ class LineParser:
         ))
 
     def _pipe(self):
-        if self._argument_parts:
+        if self._has_parts():
             self._arguments.append(self._to_argument())
 
         self._commands.append(Command(
-            self._arguments,
-            self._redirects,
+            tuple(self._arguments),
+            tuple(self._redirects),
             self._is_job,
         ))
 
@@ -236,22 +348,14 @@ class LineParser:
         self._is_job = False
 
     def _variable(self):
-        builder = StringIO()
-
-        ending_characters = [END]
-
-        is_braced = self._peek() == BRACE_OPEN
-        if is_braced:
-            ending_characters.append(BRACE_CLOSE)
-            self._next()
-
-        while (character := self._peek()) not in ending_characters and (character.isalnum() or character == "_"):
-            builder.write(self._next())
+        match = VARIABLE_PATTERN.match(self._line, self._index + 1)
+        self._index = match.end() - 1
 
-        if is_braced and self._peek() == BRACE_CLOSE:
-            self._next()
+        name = match.group("braced")
+        if name is None:
+            name = match.group("name")
 
-        name = builder.getvalue()
+        self._flush_literal()
         self._argument_parts.append(VariablePart(name))
 
     def _next(self):
@@ -1,96 +1,336 @@
 import os
+import signal
+import sys
+import errno
+import threading
+from dataclasses import dataclass
+from typing import List, Union
 
-from .command import BUILTINS, RedirectStreams, which
+from .command import BUILTINS, RedirectStreams, is_pipeline_safe
+from .executable import which
 from .parser import Command
-from . import job
+from . import job, variable
+
+STATUS_VARIABLE = "?"
+PIPESTATUS_VARIABLE = "PIPESTATUS"
+PIPEFAIL_OPTION = "pipefail"
+
+NOT_FOUND_STATUS = 127
+NOT_EXECUTABLE_STATUS = 126
+
+# python ignores some of these and the shell ignores the others, but an ignored disposition survives exec
+DEFAULT_SIGNALS = (signal.SIGPIPE, signal.SIGXFSZ, signal.SIGTTOU, signal.SIGTTIN, signal.SIGTSTP)
+
+last_status = 0
+pipe_status: List[int] = [0]
+
+CAN_SPAWN = hasattr(os, "posix_spawn")
+
+# held while a stage forks and while a builtin stage closes its descriptors, so that the list a child sees is exact
+_held_fds_lock = threading.Lock()
+
+# since 3.14 a spawn given None inherits the environment as it is, exports already reach it through os.environ
+INHERITED_ENVIRONMENT = None if sys.version_info >= (3, 14) else os.environ
 
 
 def _exec(command: Command):
+    # only builtins that change shell state are forked, anything else is launched by _start
+    builtin = BUILTINS[command.program]
     redirected_streams = RedirectStreams.open(command.redirects)
 
-    builtin = BUILTINS.get(command.program)
-    if builtin:
-        builtin(command.arguments, redirected_streams)
-        redirected_streams.close()
-        os._exit(0)
+    builtin(command.arguments, redirected_streams)
+    redirected_streams.close()
+    os._exit(redirected_streams.status)
 
-    path = which(command.program)
-    if not path:
-        print(f"{command.program}: command not found")
-        redirected_streams.close()
-        os._exit(1)
 
-    os.dup2(redirected_streams.output_fd, 1)
-    os.dup2(redirected_streams.error_fd, 2)
-    redirected_streams.close()
+@dataclass
+class FailedStage:
+    status: int
 
-    os.execv(path, command.arguments)
-    os._exit(1)
 
+class BuiltinStage(threading.Thread):
 
-def _spawn(fd_in: int, fd_out: int, command: list[Command]) -> int:
-    pid = os.fork()
+    def __init__(self, command: Command, fd_out: int, held_fds: List[int]):
+        super().__init__(name=command.program, daemon=True)
+
+        self.status = 0
+
+        self._command = command
+        self._redirected_streams = RedirectStreams.open(command.redirects, fd_out if fd_out != 1 else None)
+        self._redirected_streams.is_pipeline_stage = True
+
+        # open until the builtin finishes, a stage forked meanwhile must not keep the pipe open
+        self._fds = []
+        if self._redirected_streams.is_output_redirected:
+            self._fds.append(self._redirected_streams.output_fd)
+
+        if self._redirected_streams.is_error_redirected:
+            self._fds.append(self._redirected_streams.error_fd)
+
+        self._held_fds = held_fds
+        self._held_fds.extend(self._fds)
+
+    def run(self):
+        builtin = BUILTINS[self._command.program]
+
+        try:
+            builtin(self._command.arguments, self._redirected_streams)
+            self.status = self._redirected_streams.status
+        except BrokenPipeError:
+            self.status = 128 + signal.SIGPIPE
+        except Exception as exception:
+            print(f"{self._command.program}: {exception}", file=sys.stderr)
+            self.status = 1
+        finally:
+            self._close()
+
+    def _close(self):
+        try:
+            # flushed before taking the lock, a full pipe must not hold up the stage that would read it
+            self._redirected_streams.output.flush()
+        except BrokenPipeError:
+            # the reader is gone, whatever was still buffered has nowhere to go
+            self.status = 128 + signal.SIGPIPE
+
+        with _held_fds_lock:
+            # unlisted as they close, a stage forked later must not close a number the shell has reused since
+            for fd in self._fds:
+                self._held_fds.remove(fd)
+
+            try:
+                self._redirected_streams.close()
+            except BrokenPipeError:
+                self.status = 128 + signal.SIGPIPE
+
+
+def _fork(fd_in: int, fd_out: int, command: Command, group: int, held_fds: List[int]) -> int:
+    sys.stdout.flush()
+
+    with _held_fds_lock:
+        pid = os.fork()
 
     if pid == 0:
+        _enter_group(0, group)
+        _reset_signals()
+
         os.dup2(fd_in, 0)
         os.dup2(fd_out, 1)
 
+        for fd in held_fds:
+            os.close(fd)
+
         _exec(command)
 
+    # also done by the child, whichever runs first
+    _enter_group(pid, group)
+
     return pid
 
 
-def pipeline(commands: list[Command]):
+def _launch(
+    path: str,
+    command: Command,
+    redirected_streams: RedirectStreams,
+    fd_in: int,
+    fd_out: int,
+    group: int,
+) -> Union[int, FailedStage]:
+    sys.stdout.flush()
+
+    descriptors = _descriptors(redirected_streams, fd_in, fd_out)
+
+    if not CAN_SPAWN:
+        return _fork_exec(path, command, descriptors, group)
+
+    # the interpreter is not forked, and only the descriptors duplicated here reach the child since python opens everything close-on-exec
+    file_actions = [
+        (os.POSIX_SPAWN_DUP2, fd, target)
+        for fd, target in descriptors
+    ]
+
+    try:
+        return os.posix_spawn(
+            path,
+            command.arguments,
+            INHERITED_ENVIRONMENT,
+            file_actions=file_actions,
+            setpgroup=group,
+            setsigmask=(),
+            setsigdef=DEFAULT_SIGNALS,
+        )
+    except OSError as error:
+        print(f"{command.program}: {error.strerror}")
+        return FailedStage(_launch_status(error))
+
+
+def _launch_status(error: OSError):
+    # a file that went away since the lookup is not found, anything else found it but could not run it
+    return NOT_FOUND_STATUS if error.errno == errno.ENOENT else NOT_EXECUTABLE_STATUS
+
+
+def _descriptors(redirected_streams: RedirectStreams, fd_in: int, fd_out: int):
+    output_fd = redirected_streams.output_fd
+    if fd_out != 1 and not redirected_streams.is_output_redirected:
+        output_fd = fd_out
+
+    return [
+        (fd, target)
+        for fd, target in [(fd_in, 0), (output_fd, 1), (redirected_streams.error_fd, 2)]
+        if fd != target
+    ]
+
+
+def _fork_exec(path: str, command: Command, descriptors, group: int):
     pid = os.fork()
 
     if pid == 0:
-        fd_in = 0
+        _enter_group(0, group)
+        _reset_signals()
 
-        for command in commands[:-1]:
-            pipe_fds = os.pipe()
+        for fd, target in descriptors:
+            os.dup2(fd, target)
 
-            _spawn(fd_in, pipe_fds[1], command)
+        try:
+            os.execv(path, command.arguments)
+        except OSError as error:
+            print(f"{command.program}: {error.strerror}")
+            os._exit(_launch_status(error))
 
-            os.close(pipe_fds[1])
+    _enter_group(pid, group)
 
-            fd_in = pipe_fds[0]
+    return pid
 
-        os.dup2(fd_in, 0)
 
-        _exec(commands[-1])
+def _enter_group(pid: int, group: int):
+    try:
+        os.setpgid(pid, group)
+    except (PermissionError, ProcessLookupError):
+        # the child already exec'd or exited, it joined the group itself
+        pass
 
-    os.waitpid(pid, 0)
-    return pid
 
+def _reset_signals():
+    for number in DEFAULT_SIGNALS:
+        signal.signal(number, signal.SIG_DFL)
 
-def single(command: Command):
-    redirected_streams = RedirectStreams.open(command.redirects)
+    # SIGCHLD is blocked by the shell while a pipeline starts
+    signal.pthread_sigmask(signal.SIG_SETMASK, ())
 
-    builtin = BUILTINS.get(command.program)
-    if builtin:
-        shell_exit_code = builtin(command.arguments, redirected_streams)
-        redirected_streams.close()
-        return shell_exit_code
 
+def pipeline(commands: List[Command]):
+    text = " | ".join(" ".join(command.arguments) for command in commands)
+
+    with job.deferred_reaping():
+        stages, group = _start_stages(commands)
+        pids = [stage for stage in stages if isinstance(stage, int)]
+
+        if commands[-1].is_job and isinstance(stages[-1], int):
+            job.add(pids, text, group)
+
+            _set_status([0])
+            return
+
+        current = job.RunningJob(0, pids, text, group)
+        is_stopped = pids and not job.foreground(current)
+
+    # stopped with ^Z, it is in the job table now
+    if is_stopped:
+        _set_status([128 + signal.SIGTSTP])
+        return
+
+    _set_status([
+        _stage_status(stage, current)
+        for stage in stages
+    ])
+
+
+def _start_stages(commands: List[Command]):
+    stages: List[Union[int, BuiltinStage, FailedStage]] = []
+    held_fds: List[int] = []
+    group = 0
+    fd_in = 0
+
+    for index, command in enumerate(commands):
+        is_last = index == len(commands) - 1
+
+        if is_last:
+            fd_out = 1
+            next_fd_in = None
+        else:
+            next_fd_in, fd_out = os.pipe()
+
+        if command.program in BUILTINS and is_pipeline_safe(command.arguments):
+            stage = BuiltinStage(command, fd_out, held_fds)
+            stage.start()
+        elif command.program in BUILTINS:
+            stage = _fork(fd_in, fd_out, command, group, held_fds)
+        else:
+            stage = _start(command, fd_in, fd_out, group)
+
+        stages.append(stage)
+        if not group and isinstance(stage, int):
+            group = stage
+
+        if fd_in != 0:
+            os.close(fd_in)
+
+        if fd_out != 1:
+            os.close(fd_out)
+
+        fd_in = next_fd_in
+
+    return stages, group
+
+
+def _stage_status(stage: Union[int, BuiltinStage, FailedStage], current: job.RunningJob):
+    if isinstance(stage, FailedStage):
+        return stage.status
+
+    if isinstance(stage, BuiltinStage):
+        stage.join()
+        return stage.status
+
+    return current.statuses[stage]
+
+
+def _start(command: Command, fd_in: int, fd_out: int, group: int):
     path = which(command.program)
     if not path:
         print(f"{command.program}: command not found")
-        redirected_streams.close()
-        return
+        return FailedStage(NOT_FOUND_STATUS)
 
-    pid = os.fork()
+    redirected_streams = RedirectStreams.open(command.redirects)
 
-    if pid == 0:
-        os.dup2(redirected_streams.output_fd, 1)
-        os.dup2(redirected_streams.error_fd, 2)
+    try:
+        return _launch(path, command, redirected_streams, fd_in, fd_out, group)
+    finally:
         redirected_streams.close()
 
-        os.execv(path, command.arguments)
-        os._exit(1)
 
-    if command.is_job:
-        job.add(pid, " ".join(command.arguments))
+def _set_status(statuses: List[int]):
+    global last_status, pipe_status
+
+    pipe_status = statuses
+
+    last_status = statuses[-1]
+    if PIPEFAIL_OPTION in variable.options:
+        last_status = next((status for status in reversed(statuses) if status), 0)
+
+    variable.set(STATUS_VARIABLE, str(last_status))
+    variable.set(PIPESTATUS_VARIABLE, " ".join(map(str, statuses)))
+
+
+def single(command: Command):
+    builtin = BUILTINS.get(command.program)
+    if not builtin:
+        pipeline([command])
         return
 
-    os.waitpid(pid, 0)
+    redirected_streams = RedirectStreams.open(command.redirects)
+
+    shell_exit_code = builtin(command.arguments, redirected_streams)
     redirected_streams.close()
+
+    _set_status([redirected_streams.status])
+
+    return shell_exit_code
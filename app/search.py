@@ -0,0 +1,178 @@
+import bisect
+from array import array
+from typing import Dict, Iterator, Optional
+
+NGRAM = 3
+
+EMPTY = array("I")
+
+
+class TrigramIndex:
+
+    def __init__(self):
+        self._postings: Dict[str, array] = {}
+        self._size = 0
+
+        self.oldest = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, number: int, line: str):
+        # shorter grams too, so that the first keystrokes of a search look up postings as well
+        for gram in _grams(line):
+            postings = self._postings.get(gram)
+            if postings is None:
+                postings = self._postings[gram] = array("I")
+
+            postings.append(number)
+
+        self._size = number + 1
+
+    def candidates(self, query: str, before: int) -> Optional[Iterator[int]]:
+        if not query:
+            return None
+
+        grams = _trigrams(query) if len(query) >= NGRAM else {query}
+
+        rarest, *others = sorted(
+            (self._postings.get(gram, EMPTY) for gram in grams),
+            key=len,
+        )
+
+        # only lines with every trigram of the query are left for the substring check
+        return (
+            number
+            for number in _newest_first(rarest, before)
+            if all(_contains(postings, number) for postings in others)
+        )
+
+    def prune(self, oldest: int):
+        for gram, postings in list(self._postings.items()):
+            del postings[:bisect.bisect_left(postings, oldest)]
+
+            if not postings:
+                del self._postings[gram]
+
+        self.oldest = oldest
+
+
+class PrefixIndex:
+
+    def __init__(self):
+        self._root = _Node("", -1)
+        self._size = 0
+
+        self.oldest = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, number: int, line: str):
+        node = self._root
+        node.newest = max(node.newest, number)
+
+        rest = line
+        while rest:
+            child = node.children.get(rest[0])
+            if child is None:
+                node.children[rest[0]] = _Node(rest, number)
+                break
+
+            shared = _shared_length(child.label, rest)
+
+            if shared < len(child.label):
+                middle = _Node(child.label[:shared], child.newest)
+                child.label = child.label[shared:]
+
+                middle.children[child.label[0]] = child
+                node.children[rest[0]] = middle
+                child = middle
+
+            child.newest = max(child.newest, number)
+
+            node = child
+            rest = rest[shared:]
+
+        self._size = max(self._size, number + 1)
+
+    def newest(self, prefix: str) -> Optional[int]:
+        node = self._root
+
+        rest = prefix
+        while rest:
+            child = node.children.get(rest[0])
+            if child is None:
+                return None
+
+            if child.label.startswith(rest):
+                return child.newest
+
+            if not rest.startswith(child.label):
+                return None
+
+            node = child
+            rest = rest[len(child.label):]
+
+        return node.newest if node.newest >= 0 else None
+
+    def prune(self, oldest: int):
+        # a subtree whose newest entry is older holds nothing newer either
+        nodes = [self._root]
+
+        while nodes:
+            node = nodes.pop()
+
+            for key, child in list(node.children.items()):
+                if child.newest < oldest:
+                    del node.children[key]
+                else:
+                    nodes.append(child)
+
+        if self._root.newest < oldest:
+            self._root.newest = -1
+
+        self.oldest = oldest
+
+
+class _Node:
+
+    def __init__(self, label: str, newest: int):
+        self.label = label
+        self.newest = newest
+        self.children: Dict[str, "_Node"] = {}
+
+
+def _shared_length(first: str, second: str):
+    length = 0
+    end = min(len(first), len(second))
+
+    while length < end and first[length] == second[length]:
+        length += 1
+
+    return length
+
+
+def _contains(postings: array, number: int):
+    position = bisect.bisect_left(postings, number)
+    return position < len(postings) and postings[position] == number
+
+
+def _newest_first(postings: array, before: int):
+    end = bisect.bisect_left(postings, before)
+    return (postings[index] for index in range(end - 1, -1, -1))
+
+
+def _grams(text: str):
+    return {
+        text[index:index + length]
+        for length in range(1, NGRAM + 1)
+        for index in range(len(text) - length + 1)
+    }
+
+
+def _trigrams(text: str):
+    return {
+        text[index:index + NGRAM]
+        for index in range(len(text) - NGRAM + 1)
+    }
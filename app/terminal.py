@@ -0,0 +1,258 @@
+import codecs
+import collections
+import fcntl
+import os
+import re
+import select
+import struct
+import sys
+import termios
+from typing import Callable, Deque, List, Optional
+
+ESCAPE = "\x1b"
+UP = "\x1b[A"
+DOWN = "\x1b[B"
+RIGHT = "\x1b[C"
+LEFT = "\x1b[D"
+DELETE = "\x1b[3~"
+HOME_KEYS = {"\x1b[H", "\x1bOH", "\x1b[1~", "\x1b[7~", "\x01"}
+END_KEYS = {"\x1b[F", "\x1bOF", "\x1b[4~", "\x1b[8~", "\x05"}
+WORD_LEFT_KEYS = {"\x1b[1;5D", "\x1b[1;3D", "\x1bb"}
+WORD_RIGHT_KEYS = {"\x1b[1;5C", "\x1b[1;3C", "\x1bf"}
+REVERSE_SEARCH = "\x12"
+CANCEL = "\x07"
+PASTE_START = "\x1b[200~"
+PASTE_END = "\x1b[201~"
+ENABLE_BRACKETED_PASTE = "\x1b[?2004h"
+DISABLE_BRACKETED_PASTE = "\x1b[?2004l"
+CHUNK_SIZE = 4096
+LINE_ENDS = b"\r\n"
+PASTE_START_BYTES = PASTE_START.encode()
+
+# how long an escape waits for the rest of a sequence before it is taken as a lone ESC
+ESCAPE_TIMEOUT = 0.1
+DEFAULT_COLUMNS = 80
+DEFAULT_ROWS = 24
+
+# returned instead of a key when the wakeup descriptor became readable
+WAKEUP = object()
+
+TEXT_PATTERN = re.compile("[^\x00-\x1f\x7f]+")
+CARET_TABLE = {
+    code: f"^{chr(code ^ 0x40)}"
+    for code in [*range(0x20), 0x7f]
+}
+
+_pending_output: List[str] = []
+_size: Optional[os.terminal_size] = None
+
+
+def write(data: str):
+    _pending_output.append(data)
+
+
+def flush():
+    if not _pending_output:
+        return
+
+    data = "".join(_pending_output).encode()
+    _pending_output.clear()
+
+    sys.stdout.flush()
+
+    fd = sys.stdout.fileno()
+    while data:
+        written = os.write(fd, data)
+        data = data[written:]
+
+
+def columns():
+    return _terminal_size().columns
+
+
+def rows():
+    return _terminal_size().lines
+
+
+def on_resize(signum, frame):
+    global _size
+
+    # asked again on the next use, SIGWINCH may come in bursts while a window is dragged
+    _size = None
+
+
+def _terminal_size():
+    global _size
+
+    if _size is None:
+        try:
+            size = os.get_terminal_size(sys.stdout.fileno())
+        except (OSError, ValueError):
+            size = os.terminal_size((DEFAULT_COLUMNS, DEFAULT_ROWS))
+
+        _size = os.terminal_size((size.columns or DEFAULT_COLUMNS, size.lines or DEFAULT_ROWS))
+
+    return _size
+
+
+def display(text: str):
+    return text.translate(CARET_TABLE)
+
+
+class Paste(str):
+    ...
+
+
+class KeyReader:
+
+    def __init__(self, fd: int, wakeup_fd: Optional[int] = None, idle: Optional[Callable[[], bool]] = None):
+        self._fd = fd
+        self._wakeup_fd = wakeup_fd
+        self._idle = idle
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._text = ""
+        self._keys: Deque[str] = collections.deque()
+        self._paste: Optional[List[str]] = None
+
+    def next(self):
+        while not self._keys:
+            flush()
+
+            is_escape_pending = self._paste is None and self._text.startswith(ESCAPE)
+
+            descriptors = [self._fd]
+            if self._wakeup_fd is not None:
+                descriptors.append(self._wakeup_fd)
+
+            readable = self._wait(descriptors, ESCAPE_TIMEOUT if is_escape_pending else None)
+
+            if not readable:
+                self._keys.append(ESCAPE)
+                self._text = self._text[1:]
+                self._split()
+                continue
+
+            if self._wakeup_fd in readable:
+                _drain(self._wakeup_fd)
+                return WAKEUP
+
+            data = self._read()
+            if not data:
+                return None
+
+            self._text += self._decoder.decode(data)
+            self._split()
+
+        return self._keys.popleft()
+
+    def _wait(self, descriptors: List[int], timeout: Optional[float]):
+        # background work runs one step at a time while nothing is waiting, a key is never held up by more than a step
+        while self._idle is not None and timeout is None:
+            readable, _, _ = select.select(descriptors, [], [], 0)
+            if readable or not self._idle():
+                break
+
+        readable, _, _ = select.select(descriptors, [], [], timeout)
+        return readable
+
+    def _read(self):
+        # inside a bracketed paste everything up to the end marker is part of the line
+        if self._paste is not None:
+            return os.read(self._fd, CHUNK_SIZE)
+
+        # otherwise only what is there already and never past the end of a line, whatever follows is typeahead for
+        # the command that line starts, which reads it from the terminal itself
+        data = bytearray()
+
+        for _ in range(max(_available(self._fd), 1)):
+            byte = os.read(self._fd, 1)
+            if not byte:
+                break
+
+            data += byte
+            if byte in LINE_ENDS or data.endswith(PASTE_START_BYTES):
+                break
+
+        return bytes(data)
+
+    def _split(self):
+        text = self._text
+        index = 0
+
+        while index < len(text):
+            if self._paste is not None:
+                end = text.find(PASTE_END, index)
+
+                if end == -1:
+                    # keep what could be the beginning of the end marker
+                    end = max(index, len(text) - len(PASTE_END) + 1)
+
+                    self._paste.append(text[index:end])
+                    index = end
+                    break
+
+                self._paste.append(text[index:end])
+                self._keys.append(_to_paste("".join(self._paste)))
+
+                self._paste = None
+                index = end + len(PASTE_END)
+                continue
+
+            character = text[index]
+
+            if character == ESCAPE:
+                end = _find_escape_end(text, index)
+                if end is None:
+                    break
+
+                if text.startswith(PASTE_START, index):
+                    self._paste = []
+                    index = end
+                    continue
+            elif match := TEXT_PATTERN.match(text, index):
+                end = match.end()
+            else:
+                end = index + 1
+
+            self._keys.append(text[index:end])
+            index = end
+
+        self._text = text[index:]
+
+
+def _available(fd: int):
+    try:
+        return struct.unpack("i", fcntl.ioctl(fd, termios.FIONREAD, b"\0" * 4))[0]
+    except OSError:
+        return 1
+
+
+def _drain(fd: int):
+    try:
+        while os.read(fd, CHUNK_SIZE):
+            pass
+    except BlockingIOError:
+        pass
+
+
+def _to_paste(text: str):
+    return Paste(text.replace("\r\n", "\n").replace("\r", "\n"))
+
+
+def _find_escape_end(text: str, index: int):
+    if index + 1 >= len(text):
+        return None
+
+    kind = text[index + 1]
+
+    if kind == "[":
+        for end in range(index + 2, len(text)):
+            if "@" <= text[end] <= "~":
+                return end + 1
+
+        return None
+
+    if kind == "O":
+        return index + 3 if index + 2 < len(text) else None
+
+    return index + 2
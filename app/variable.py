@@ -1,15 +1,88 @@
-from typing import Dict
+import itertools
+import os
+from typing import Dict, Optional, Set
 
-store: Dict[str, str] = {}
+# shared by every store, so that two stores never report the same generation
+_generations = itertools.count()
+
+
+class Store(Dict[str, str]):
+
+    def __init__(self, *arguments, **keywords):
+        super().__init__(*arguments, **keywords)
+        self.generation = next(_generations)
+
+    def __setitem__(self, name: str, value: str):
+        # rewriting the same value, such as $? after another successful command, keeps expansions cached
+        if name in self and self[name] == value:
+            return
+
+        super().__setitem__(name, value)
+        self.generation = next(_generations)
+
+    def __delitem__(self, name: str):
+        super().__delitem__(name)
+        self.generation = next(_generations)
+
+    def pop(self, *arguments):
+        self.generation = next(_generations)
+        return super().pop(*arguments)
+
+    def popitem(self):
+        self.generation = next(_generations)
+        return super().popitem()
+
+    def setdefault(self, name: str, value: str = None):
+        self.generation = next(_generations)
+        return super().setdefault(name, value)
+
+    def update(self, *arguments, **keywords):
+        super().update(*arguments, **keywords)
+        self.generation = next(_generations)
+
+    def clear(self):
+        super().clear()
+        self.generation = next(_generations)
+
+
+store = Store()
+exported: Set[str] = set()
+options: Set[str] = set()
 
 
 def set(name: str, value: str):
     store[name] = value
 
+    if name in exported:
+        os.environ[name] = value
+
 
 def get(name: str):
     return store.get(name)
 
+
+def export(name: str, value: Optional[str] = None):
+    if value is not None:
+        store[name] = value
+
+    exported.add(name)
+
+    value = store.get(name)
+    if value is not None:
+        os.environ[name] = value
+
+
+def unexport(name: str):
+    exported.discard(name)
+
+    if name in os.environ:
+        del os.environ[name]
+
+
+def is_exported(name: str):
+    return name in exported or name in os.environ
+
+
 skipped = 0
 
 def is_valid_identifier(name: str):
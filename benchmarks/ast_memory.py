@@ -0,0 +1,110 @@
+import time
+import tracemalloc
+from dataclasses import dataclass
+from functools import cached_property
+from typing import List
+
+from app import parser, variable
+
+LINES = 20_000
+LINE = "grep -v \"$PATTERN\" 'input file.txt' 2> errors.log | sort -u > ${OUTPUT}.txt"
+
+
+# the dict-backed node types the parser produced before
+@dataclass
+class Redirect:
+    stream_name: parser.StandardNamedStream
+    path: "Argument"
+    append: bool
+
+
+@dataclass
+class Argument:
+    parts: list
+
+
+@dataclass
+class LiteralPart:
+    value: str
+
+
+@dataclass
+class VariablePart:
+    name: str
+
+
+@dataclass
+class Command:
+    raw_arguments: List[Argument]
+    redirects: List[Redirect]
+    is_job: bool = False
+
+    @cached_property
+    def arguments(self):
+        # resolved the way parser.Command does it, so that both sides do the same work
+        arguments = []
+
+        for argument in self.raw_arguments:
+            resolved = "".join(
+                part.value if isinstance(part, LiteralPart) else variable.store.get(part.name, "")
+                for part in argument.parts
+            )
+
+            if resolved or any(isinstance(part, LiteralPart) for part in argument.parts):
+                arguments.append(resolved)
+
+        return arguments
+
+
+UNSLOTTED = (Command, Argument, LiteralPart, VariablePart, Redirect)
+SLOTTED = (parser.Command, parser.Argument, parser.LiteralPart, parser.VariablePart, parser.Redirect)
+
+
+def _rebuild(commands: List[parser.Command], types):
+    command_type, argument_type, literal_type, variable_type, redirect_type = types
+
+    def rebuild_argument(argument: parser.Argument):
+        return argument_type([
+            literal_type(part.value) if isinstance(part, parser.LiteralPart) else variable_type(part.name)
+            for part in argument.parts
+        ])
+
+    return [
+        command_type(
+            [rebuild_argument(argument) for argument in command.raw_arguments],
+            [redirect_type(redirect.stream_name, rebuild_argument(redirect.path), redirect.append) for redirect in command.redirects],
+            command.is_job,
+        )
+        for command in commands
+    ]
+
+
+def _measure(name: str, build):
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    trees = [build() for _ in range(LINES)]
+    for commands in trees:
+        for command in commands:
+            command.arguments
+
+    seconds = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{name:<16} {current / 1024 / 1024:7.2f} MiB ({current / LINES:6.0f} B/line), build {seconds * 1_000:7.1f} ms")
+
+
+def main():
+    variable.set("PATTERN", "needle")
+    variable.set("OUTPUT", "sorted")
+
+    parsed = parser.LineParser(LINE).parse()
+    assert _rebuild(parsed, UNSLOTTED)[0].arguments == parsed[0].arguments
+
+    _measure("dataclass", lambda: _rebuild(parsed, UNSLOTTED))
+    _measure("slotted", lambda: _rebuild(parsed, SLOTTED))
+
+
+if __name__ == "__main__":
+    main()
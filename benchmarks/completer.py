@@ -0,0 +1,69 @@
+import os
+import sys
+import tempfile
+import timeit
+
+from app import completer
+
+ITERATIONS = 50
+
+HANDLER = f"""#!{sys.executable}
+import os
+import sys
+
+CANDIDATES = [f"option-{{index}}" for index in range(500)]
+
+
+def complete(word):
+    return [candidate for candidate in CANDIDATES if candidate.startswith(word)]
+
+
+if os.environ.get("{completer.PERSISTENT_ENVVAR}"):
+    stdin = sys.stdin.buffer
+    stdout = sys.stdout.buffer
+
+    while header := stdin.readline():
+        fields = []
+
+        for _ in range(int(header)):
+            length = int(stdin.readline())
+            fields.append(stdin.read(length).decode())
+            stdin.read(1)
+
+        line, point, program, word, previous = fields
+        for candidate in complete(word):
+            stdout.write(candidate.encode() + b"\\n")
+
+        stdout.write(b"\\n")
+        stdout.flush()
+else:
+    for candidate in complete(sys.argv[2]):
+        print(candidate)
+"""
+
+
+def _report(name: str, seconds: float):
+    print(f"{name:<24} {seconds / ITERATIONS * 1_000:8.2f} ms/tab")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        handler_path = os.path.join(root, "handler.py")
+        with open(handler_path, "w") as fd:
+            fd.write(HANDLER)
+
+        os.chmod(handler_path, 0o755)
+
+        completer.register("spawned", handler_path)
+        assert len(completer.collect("spawned", "spawned option-1")) == 111
+        _report("spawn per tab (-C)", timeit.timeit(lambda: completer.collect("spawned", "spawned option-1"), number=ITERATIONS))
+
+        completer.register("persistent", handler_path, is_persistent=True)
+        assert len(completer.collect("persistent", "persistent option-1")) == 111
+        _report("persistent (-P)", timeit.timeit(lambda: completer.collect("persistent", "persistent option-1"), number=ITERATIONS))
+
+        completer.destroy()
+
+
+if __name__ == "__main__":
+    main()
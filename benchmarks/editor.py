@@ -0,0 +1,47 @@
+import timeit
+
+from app.editor import LineEditor
+
+ITERATIONS = 10_000
+
+
+class _Counter:
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data: str):
+        self.size += len(data)
+
+
+def _bench(length: int, at_end: bool):
+    counter = _Counter()
+
+    line = LineEditor(counter.write)
+    line.insert("x" * length)
+    if not at_end:
+        line.left(length // 2)
+
+    counter.size = 0
+
+    def edit():
+        line.insert("y")
+        line.left()
+        line.right()
+        line.backspace()
+
+    seconds = timeit.timeit(edit, number=ITERATIONS)
+
+    name = f"{'end' if at_end else 'mid-line'} edit, {length} chars"
+    print(f"{name:<32} {seconds / ITERATIONS * 1_000_000:8.2f} us, {counter.size / ITERATIONS:5.1f} bytes/edit")
+
+
+def main():
+    # wider than the terminal from 100 characters on, which is what the redraw has to cope with
+    for at_end in (False, True):
+        for length in (100, 10_000, 1_000_000):
+            _bench(length, at_end)
+
+
+if __name__ == "__main__":
+    main()
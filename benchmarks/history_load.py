@@ -0,0 +1,58 @@
+import os
+import tempfile
+import time
+import tracemalloc
+
+from app import history
+
+LINES = 1_000_000
+
+
+def _measure(name: str, load):
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    lines = load()
+    last = lines[len(lines) - 1]
+
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{name:<24} {seconds * 1_000:8.2f} ms, peak {peak / 1024 / 1024:7.2f} MiB ({len(lines)} entries, last {last!r})")
+
+
+def _read_into_list(path: str):
+    lines = []
+
+    with open(path, "r") as fd:
+        for line in fd:
+            line = line.strip("\n")
+
+            if line:
+                lines.append(line)
+
+    return lines
+
+
+def _read_lazy(path: str):
+    history.read(path)
+    return history.previous_lines
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "history")
+
+        with open(path, "w") as fd:
+            for number in range(LINES):
+                fd.write(f"git commit -m 'change number {number}'\n")
+
+        print(f"history file: {os.path.getsize(path) / 1024 / 1024:.1f} MiB")
+
+        _measure("read into list", lambda: _read_into_list(path))
+        _measure("lazy, pread", lambda: _read_lazy(path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import time
+import tracemalloc
+
+from app.lines import CompactLines
+
+ENTRIES = 1_000_000
+
+
+def _measure(name: str, store, append):
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    for number in range(ENTRIES):
+        append(store, f"git commit -m 'change number {number}'")
+
+    seconds = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for number in range(0, ENTRIES, 7):
+        store[number]
+    lookup = (time.perf_counter() - start) / (ENTRIES // 7)
+
+    print(f"{name:<16} {current / 1024 / 1024:7.2f} MiB ({current / ENTRIES:5.1f} B/entry), append {seconds * 1_000:7.1f} ms, lookup {lookup * 1_000_000_000:5.0f} ns")
+
+
+def main():
+    _measure("list of str", [], list.append)
+    _measure("compact", CompactLines(), CompactLines.append)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import os
+import random
+import tempfile
+import time
+
+from app import history
+from app.lines import Lines
+from app.search import TrigramIndex
+
+LINES = 200_000
+WORDS = ["git", "commit", "status", "docker", "run", "kubectl", "get", "pods", "make", "test", "echo", "grep", "ls", "cd", "src", "build"]
+
+
+def _lines():
+    generator = random.Random(42)
+
+    for number in range(LINES):
+        words = generator.choices(WORDS, k=5)
+        yield " ".join(words) + f" --id={number}"
+
+
+def _worst_keystroke(name: str, query: str):
+    worst = 0.0
+
+    for end in range(1, len(query) + 1):
+        start = time.perf_counter()
+        history.search(query[:end])
+        worst = max(worst, time.perf_counter() - start)
+
+    print(f"{name:<32} {worst * 1_000:8.3f} ms")
+
+
+def _load():
+    # a HISTFILE is indexed a step at a time while the shell waits for input
+    with tempfile.NamedTemporaryFile("w", delete=False) as file:
+        file.write("".join(f"{line}\n" for line in _lines()))
+
+    try:
+        history.previous_lines = Lines()
+        history.index = TrigramIndex()
+        history.read(file.name)
+
+        steps = 0
+        slowest = 0.0
+        start = time.perf_counter()
+
+        while True:
+            step = time.perf_counter()
+            is_pending = history.index_pending()
+            slowest = max(slowest, time.perf_counter() - step)
+            steps += 1
+
+            if not is_pending:
+                break
+
+        print(f"{'index loaded 200k lines':<32} {(time.perf_counter() - start) * 1_000:8.2f} ms in {steps} steps, slowest {slowest * 1_000:.2f} ms")
+    finally:
+        os.unlink(file.name)
+
+
+def main():
+    start = time.perf_counter()
+    for line in _lines():
+        history.add_line(line)
+
+    print(f"{'index 200k lines':<32} {(time.perf_counter() - start) * 1_000:8.2f} ms")
+
+    _worst_keystroke("worst keystroke", "docker run --id=1234")
+    _worst_keystroke("worst keystroke, no match", "zq")
+
+    start = time.perf_counter()
+    found = history.search("--id=1234")
+    print(f"{'old entry lookup':<32} {(time.perf_counter() - start) * 1_000:8.3f} ms (line {found})")
+
+    _load()
+    _worst_keystroke("worst keystroke, loaded", "docker run --id=1234")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import os
+import resource
+import shutil
+import time
+
+from app import run
+
+BALLAST_STEPS_MB = [0, 256, 1024]
+ITERATIONS = 200
+
+
+def _fork_exec(program: str):
+    pid = os.fork()
+
+    if pid == 0:
+        os.execv(program, [program])
+        os._exit(1)
+
+    return pid
+
+
+def _spawn(program: str):
+    return os.posix_spawn(program, [program], run.INHERITED_ENVIRONMENT)
+
+
+def _measure(launch, program: str):
+    start = time.perf_counter()
+
+    for _ in range(ITERATIONS):
+        os.waitpid(launch(program), 0)
+
+    return (time.perf_counter() - start) / ITERATIONS
+
+
+def main():
+    program = shutil.which("true")
+    ballast = []
+
+    for megabytes in BALLAST_STEPS_MB:
+        while len(ballast) < megabytes:
+            # touched pages, as held by large history and completion caches
+            ballast.append(bytearray(os.urandom(1024)) * 1024)
+
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        fork = _measure(_fork_exec, program)
+        spawn = _measure(_spawn, program)
+
+        print(f"rss {rss:7.0f} MiB   fork+exec {fork * 1_000_000:8.1f} us   posix_spawn {spawn * 1_000_000:8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
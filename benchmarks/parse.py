@@ -0,0 +1,41 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "tests"))
+
+from reference_parser import ReferenceLineParser
+
+from app.parser import LineParser
+
+SIZES = [1_000, 10_000, 100_000]
+
+
+def _lines(size: int):
+    return {
+        "words": "echo " + " ".join(["argument"] * (size // 9)),
+        "single quoted": f"echo '{'x' * size}'",
+        "double quoted": f'echo "{"x" * size}"',
+        "variables": "echo " + "a$HOME" * (size // 6),
+        "pipeline": " | ".join(["grep -v x > out"] * (size // 18)),
+    }
+
+
+def _measure(parser, line: str):
+    start = time.perf_counter()
+    parser(line).parse()
+    return time.perf_counter() - start
+
+
+def main():
+    for size in SIZES:
+        for name, line in _lines(size).items():
+            reference = _measure(ReferenceLineParser, line)
+            scanner = _measure(LineParser, line)
+
+            label = f"{name} {size // 1_000}k"
+            print(f"{label:<24} {reference * 1_000:10.2f} ms -> {scanner * 1_000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
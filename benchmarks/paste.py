@@ -0,0 +1,93 @@
+import os
+import pty
+import select
+import sys
+import time
+
+PAYLOAD_SIZE = 10_000
+PASTE_START = b"\x1b[200~"
+PASTE_END = b"\x1b[201~"
+TIMEOUT = 30
+
+
+def _read_until(fd: int, predicate, output: bytearray):
+    deadline = time.monotonic() + TIMEOUT
+
+    while not predicate(output):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"waiting for shell output, got {len(output)} bytes")
+
+        readable, _, _ = select.select([fd], [], [], remaining)
+        if readable:
+            output += os.read(fd, 65536)
+
+
+def _paste(fd: int, payload: bytes):
+    output = bytearray()
+    expected = payload.count(b"x")
+
+    start = time.perf_counter()
+
+    while payload:
+        _, writable, _ = select.select([fd], [fd], [])
+
+        if writable:
+            written = os.write(fd, payload[:1024])
+            payload = payload[written:]
+
+        output += _drain(fd)
+
+    _read_until(fd, lambda output: output.count(b"x") >= expected, output)
+
+    return time.perf_counter() - start
+
+
+def _drain(fd: int):
+    data = bytearray()
+
+    while select.select([fd], [], [], 0)[0]:
+        data += os.read(fd, 65536)
+
+    return data
+
+
+def _report(name: str, size: int, seconds: float):
+    print(f"{name:<24} {seconds * 1_000:8.2f} ms for {size} bytes ({size / seconds / 1024:.0f} KiB/s)")
+
+
+def _read_until_closed(fd: int):
+    try:
+        while os.read(fd, 65536):
+            pass
+    except OSError:
+        pass
+
+
+def main():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    pid, fd = pty.fork()
+    if pid == 0:
+        os.environ["PYTHONPATH"] = root
+        os.environ.pop("HISTFILE", None)
+        os.execv(sys.executable, [sys.executable, "-m", "app.main"])
+
+    try:
+        _read_until(fd, lambda output: b"$ " in output, bytearray())
+
+        payload = b"echo " + b"x" * PAYLOAD_SIZE
+        _report("typed-as-is paste", len(payload), _paste(fd, payload))
+
+        lines = b"".join([b"\necho " + b"x" * 94] * (PAYLOAD_SIZE // 100))
+        payload = PASTE_START + lines + PASTE_END
+        _report("bracketed paste", len(lines), _paste(fd, payload))
+
+        os.write(fd, b"\n\x04")
+        _read_until_closed(fd)
+    finally:
+        os.waitpid(pid, 0)
+
+
+if __name__ == "__main__":
+    main()
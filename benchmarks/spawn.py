@@ -0,0 +1,39 @@
+import os
+import shutil
+import time
+
+from app import run
+
+VARIABLES = 5_000
+VALUE_SIZE = 100
+ITERATIONS = 300
+
+
+def _spawn(program: str, environment):
+    pid = os.posix_spawn(program, [program], environment())
+    os.waitpid(pid, 0)
+
+
+def _report(name: str, environment, program: str):
+    start = time.perf_counter()
+
+    for _ in range(ITERATIONS):
+        _spawn(program, environment)
+
+    seconds = time.perf_counter() - start
+    print(f"{name:<24} {seconds / ITERATIONS * 1_000_000:8.1f} us/spawn")
+
+
+def main():
+    for index in range(VARIABLES):
+        os.environ[f"BENCHMARK_{index}"] = "x" * VALUE_SIZE
+
+    program = shutil.which("true")
+
+    _report("os.environ", lambda: os.environ, program)
+    _report("rebuilt per spawn", lambda: {**os.environ}, program)
+    _report("inherited", lambda: run.INHERITED_ENVIRONMENT, program)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import random
+import time
+
+from app import history
+
+LINES = 200_000
+WORDS = ["git", "commit", "status", "docker", "run", "kubectl", "get", "pods", "make", "test", "echo", "grep", "ls", "cd", "src", "build"]
+
+
+def _scan(prefix: str):
+    for index in range(len(history.previous_lines) - 1, -1, -1):
+        line = history.previous_lines[index]
+        if line.startswith(prefix):
+            return line[len(prefix):]
+
+    return None
+
+
+def _worst_keystroke(suggest, text: str):
+    worst = 0.0
+
+    for end in range(1, len(text) + 1):
+        start = time.perf_counter()
+        suggest(text[:end])
+        worst = max(worst, time.perf_counter() - start)
+
+    return worst
+
+
+def main():
+    generator = random.Random(42)
+
+    start = time.perf_counter()
+    for number in range(LINES):
+        words = generator.choices(WORDS, k=5)
+        history.add_line(" ".join(words) + f" --id={number}")
+
+    print(f"{'index 200k lines':<32} {(time.perf_counter() - start) * 1_000:8.2f} ms")
+
+    text = "docker run --id=1234"
+
+    for name, suggest in [("linear scan", _scan), ("prefix index", history.suggest)]:
+        print(f"{name + ' worst keystroke':<32} {_worst_keystroke(suggest, text) * 1_000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
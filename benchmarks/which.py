@@ -0,0 +1,44 @@
+import os
+import tempfile
+import timeit
+
+from app import executable
+
+PATH_LENGTH = 40
+ITERATIONS = 20_000
+
+
+def _setup(root: str):
+    directories = []
+
+    for index in range(PATH_LENGTH):
+        directory = os.path.join(root, f"bin{index:02}")
+        os.mkdir(directory)
+        directories.append(directory)
+
+    program = os.path.join(directories[-1], "target")
+    with open(program, "w") as fd:
+        fd.write("#!/bin/sh\n")
+
+    os.chmod(program, 0o755)
+
+    os.environ[executable.PATH_ENVVAR] = ":".join(directories)
+
+
+def _report(name: str, seconds: float):
+    print(f"{name:<24} {seconds / ITERATIONS * 1_000_000:8.2f} us/lookup")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        _setup(root)
+
+        _report("search (full scan)", timeit.timeit(lambda: executable.search("target"), number=ITERATIONS))
+
+        executable.rehash()
+        executable.which("target")
+        _report("which (hashed)", timeit.timeit(lambda: executable.which("target"), number=ITERATIONS))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+from app.candidates import Candidates, complete
+
+
+def test_candidates_prefix_queries():
+    candidates = Candidates(["echo", "exit", "exec", "pwd", "exit"])
+
+    assert len(candidates) == 4
+    assert "exec" in candidates
+    assert "ex" not in candidates
+    assert candidates.starting_with("ex") == ["exec", "exit"]
+    assert candidates.count("e") == 3
+    assert candidates.count("z") == 0
+    assert candidates.shared_prefix("ex") == "ex"
+    assert candidates.shared_prefix("p") == "pwd"
+    assert candidates.shared_prefix("z") is None
+
+
+def test_complete_merges_sources():
+    builtins = Candidates(["echo", "exit"])
+    path = Candidates(["echo", "envsubst"])
+
+    completion = complete("ec", builtins, path)
+    assert completion.is_unique
+    assert completion.shared_prefix() == "echo"
+
+    completion = complete("e", builtins, path)
+    assert not completion.is_unique
+    assert completion.shared_prefix() == "e"
+    assert completion.matches() == ["echo", "envsubst", "exit"]
+
+    completion = complete("z", builtins, path)
+    assert completion.is_empty
+    assert completion.shared_prefix() is None
@@ -0,0 +1,152 @@
+import os
+import sys
+import time
+
+import pytest
+
+from app import completer, completion, main
+
+ONE_SHOT_HANDLER = f"""#!{sys.executable}
+import os
+import sys
+import time
+
+import pytest
+
+stdin = sys.stdin.buffer
+
+fields = []
+for _ in range(int(stdin.readline())):
+    length = int(stdin.readline())
+    fields.append(stdin.read(length).decode())
+    stdin.read(1)
+
+line, point, program, word, previous = fields
+sys.stdout.write(f"{{word}}-{{os.getpid()}}\\n{{point}}\\n\\n")
+sys.stdout.flush()
+"""
+
+HUNG_HANDLER = f"""#!{sys.executable}
+import time
+
+time.sleep(60)
+"""
+
+
+def test_persistent_handler_restarts_after_exit(tmp_path):
+    handler_path = tmp_path / "handler.py"
+    handler_path.write_text(ONE_SHOT_HANDLER)
+    os.chmod(handler_path, 0o755)
+
+    completer.register("prog", str(handler_path), is_persistent=True)
+
+    try:
+        first = completer.collect("prog", "prog ab")
+        second = completer.collect("prog", "prog ab")
+
+        assert "7" in first
+        assert len(first) == len(second) == 2
+        assert first != second
+    finally:
+        assert completer.unregister("prog")
+        assert str(handler_path) not in completer.coprocesses
+
+
+def test_handler_output_is_read_to_the_end(tmp_path, monkeypatch):
+    handler_path = tmp_path / "handler.sh"
+    handler_path.write_text("#!/bin/sh\nprintf 'alpha\\nalpine\\nbeta\\n'\n")
+    os.chmod(handler_path, 0o755)
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv(completion.TIMEOUT_ENVVAR, "5000")
+
+    completer.register("foo", str(handler_path))
+
+    try:
+        for _ in range(20):
+            assert completer.collect("foo", "foo al") == {"alpha", "alpine", "beta"}
+
+            completion.cache.clear()
+            assert main.autocomplete("foo al", False) == "p"
+    finally:
+        completer.unregister("foo")
+
+
+def test_hung_persistent_handler_is_killed_at_the_deadline(tmp_path):
+    handler_path = tmp_path / "handler.py"
+    handler_path.write_text(HUNG_HANDLER)
+    os.chmod(handler_path, 0o755)
+
+    completer.register("prog", str(handler_path), is_persistent=True)
+
+    try:
+        started = time.monotonic()
+
+        with pytest.raises(TimeoutError):
+            completer.collect("prog", "prog ab", started + 0.2)
+
+        coprocess = completer.coprocesses[str(handler_path)]
+        assert coprocess.process is None
+        assert coprocess.lock.acquire(timeout=1)
+        coprocess.lock.release()
+    finally:
+        assert completer.unregister("prog")
+
+    assert time.monotonic() - started < 5
+
+
+def test_hung_handler_is_killed_at_the_deadline(tmp_path):
+    handler_path = tmp_path / "handler.py"
+    handler_path.write_text(HUNG_HANDLER)
+    os.chmod(handler_path, 0o755)
+
+    completer.register("prog", str(handler_path))
+
+    try:
+        started = time.monotonic()
+
+        with pytest.raises(TimeoutError):
+            completer.collect("prog", "prog ab", started + 0.2)
+
+        assert time.monotonic() - started < 5
+    finally:
+        completer.unregister("prog")
+
+
+def test_hung_handler_children_are_killed_too(tmp_path):
+    handler_path = tmp_path / "handler.sh"
+    handler_path.write_text("#!/bin/sh\necho partial\nsleep 60\n")
+    os.chmod(handler_path, 0o755)
+
+    completer.register("prog", str(handler_path))
+
+    try:
+        started = time.monotonic()
+
+        with pytest.raises(TimeoutError):
+            completer.collect("prog", "prog ab", started + 0.2)
+
+        assert time.monotonic() - started < 5
+    finally:
+        completer.unregister("prog")
+
+
+def test_failed_handler_is_not_cached(tmp_path, monkeypatch):
+    handler_path = tmp_path / "handler.sh"
+    handler_path.write_text("#!/bin/sh\nexit 1\n")
+    os.chmod(handler_path, 0o755)
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv(completion.TIMEOUT_ENVVAR, "5000")
+
+    completer.register("prog", str(handler_path), is_persistent=True)
+    completion.cache.clear()
+
+    try:
+        with pytest.raises((BrokenPipeError, EOFError)):
+            completer.collect("prog", "prog ab")
+
+        main.autocomplete("prog ab", False)
+        assert len(completion.cache) == 0
+    finally:
+        completer.unregister("prog")
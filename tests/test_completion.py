@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+
+from app import completion
+from app.candidates import Candidates
+
+
+def test_gather_returns_partial_and_keeps_late_results(monkeypatch):
+    monkeypatch.setenv(completion.TIMEOUT_ENVVAR, "20")
+
+    release = threading.Event()
+
+    def slow():
+        release.wait()
+        return Candidates(["slow"])
+
+    sources = {
+        "fast": lambda: Candidates(["fast"]),
+        "slow": slow,
+    }
+
+    gathered = completion.gather(sources)
+    assert gathered.partial
+    assert list(gathered.results["fast"]) == ["fast"]
+    assert "slow" not in gathered.results
+
+    release.set()
+    while "slow" not in completion.late:
+        time.sleep(0.001)
+
+    gathered = completion.gather(sources)
+    assert not gathered.partial
+    assert list(gathered.results["slow"]) == ["slow"]
+
+
+def test_gather_keeps_one_call_per_source(monkeypatch):
+    monkeypatch.setenv(completion.TIMEOUT_ENVVAR, "20")
+
+    release = threading.Event()
+    calls = []
+
+    def hung(line):
+        calls.append(line)
+        release.wait()
+        return Candidates([line])
+
+    for line in ["a", "ab", "abc", "abcd", "abcde"]:
+        gathered = completion.gather({
+            ("completer", "prog", line): lambda line=line: hung(line),
+            ("path",): lambda: Candidates(["path"]),
+        })
+
+        assert gathered.partial
+        assert list(gathered.results[("path",)]) == ["path"]
+
+    assert calls == ["a"]
+
+    release.set()
+    while ("completer" not in completion.late):
+        time.sleep(0.001)
+
+    assert len(completion.late) == 1
+
+    gathered = completion.gather({("completer", "prog", "a"): lambda: Candidates()})
+    assert list(gathered.results[("completer", "prog", "a")]) == ["a"]
+    assert not completion.late
+
+
+def test_gather_marks_failing_source_partial():
+    def failing():
+        raise OSError("unreachable")
+
+    gathered = completion.gather({"failing": failing})
+    assert gathered.partial
+    assert len(gathered.results["failing"]) == 0
+
+
+def test_cache_counts_and_invalidates_on_directory_change(tmp_path):
+    cache = completion.Cache(capacity=2)
+
+    assert cache.get("a") is None
+    cache.put("a", 1, [str(tmp_path)])
+    assert cache.get("a") == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    (tmp_path / "new").touch()
+    os.utime(tmp_path, ns=(0, 0))
+    assert cache.get("a") is None
+
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert len(cache) == 2
+
+
+def test_cache_expires_entries():
+    cache = completion.Cache(ttl=-1)
+
+    cache.put("a", 1)
+    assert cache.get("a") is None
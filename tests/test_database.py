@@ -0,0 +1,44 @@
+import pytest
+
+from app import database
+from app.database import Record
+
+
+@pytest.fixture
+def connected(tmp_path, monkeypatch):
+    monkeypatch.setenv(database.FILE_ENVVAR, str(tmp_path / "history.db"))
+    monkeypatch.setattr(database, "pending", [])
+
+    database.initialize()
+    yield
+    database.destroy()
+
+
+def test_records_are_batched_and_queried(connected, monkeypatch):
+    monkeypatch.setattr(database, "BATCH_SIZE", 3)
+
+    database.record(Record("sleep 2", 1.0, 2.0, 0, "/tmp", 1))
+    database.record(Record("false", 2.0, 0.1, 1, "/home", 1))
+
+    assert len(database.pending) == 2
+    assert database.connection.execute("SELECT COUNT(*) FROM commands").fetchone() == (0,)
+
+    database.record(Record("ls | wc", 3.0, 0.5, 0, "/tmp", 2))
+
+    assert not database.pending
+    assert [record.command for record in database.slowest(2)] == ["sleep 2", "ls | wc"]
+    assert [record.command for record in database.in_directory("/tmp")] == ["ls | wc", "sleep 2"]
+    assert database.failed() == [Record("false", 2.0, 0.1, 1, "/home", 1)]
+
+
+@pytest.mark.parametrize("query, parameters", [
+    (database.SLOWEST_QUERY, (10,)),
+    (database.CWD_QUERY, ("/tmp", 10)),
+    (database.FAILED_QUERY, (10,)),
+])
+def test_queries_use_indexes(connected, query, parameters):
+    plan = database.connection.execute(f"EXPLAIN QUERY PLAN {query}", parameters).fetchall()
+    details = " ".join(row[-1] for row in plan)
+
+    assert "USING INDEX" in details
+    assert "TEMP B-TREE" not in details
@@ -0,0 +1,240 @@
+import re
+
+from app import editor
+from app.editor import GapBuffer, LineEditor
+
+CONTROL_PATTERN = re.compile(r"\x1b\[(\d*)([A-Za-z@])")
+
+
+def test_gap_buffer_edits_around_cursor():
+    buffer = GapBuffer("echo world", capacity=4)
+
+    assert buffer.move(-5) == "world"
+    buffer.insert("hello ")
+    assert str(buffer) == "echo hello world"
+    assert buffer.cursor == 11
+
+    assert buffer.delete_before(6) == "hello "
+    assert buffer.delete_after(1) == "w"
+    assert buffer.before_cursor() == "echo "
+    assert buffer.after_cursor() == "orld"
+    assert buffer.character_before() == " "
+    assert buffer.character_after(1) == "r"
+    assert len(buffer) == 9
+
+    assert buffer.move(100) == "orld"
+    assert buffer.character_after() is None
+
+
+def _editor():
+    output = []
+    return LineEditor(output.append), output
+
+
+def test_line_editor_writes_minimal_updates():
+    line, output = _editor()
+
+    line.insert("echo wrld")
+    line.left(3)
+    output.clear()
+
+    line.insert("o")
+    assert output == ["\x1b[@", "o"]
+    output.clear()
+
+    line.delete()
+    assert output == ["\x1b[P"]
+    assert line.text == "echo wold"
+
+    line.home()
+    line.word_right()
+    line.word_right()
+    assert line.at_end
+
+
+def test_line_editor_replace_rewrites_differing_suffix():
+    line, output = _editor()
+
+    line.insert("echo hello")
+    output.clear()
+
+    line.replace("echo help")
+    assert "".join(output) == "\x1b[2Dp\x1b[K"
+    assert line.text == "echo help"
+
+
+def test_line_editor_suggestion_is_typed_over_and_accepted():
+    line, output = _editor()
+
+    line.insert("git")
+    output.clear()
+
+    line.suggest(" status")
+    assert "".join(output) == "\x1b[90m status\x1b[0m\x1b[7D"
+    output.clear()
+
+    line.insert(" s")
+    assert output == [" s"]
+    assert line.suggestion == "tatus"
+
+    line.accept_suggestion()
+    assert line.text == "git status"
+    assert line.suggestion == ""
+
+    line.suggest(" --short")
+    output.clear()
+
+    line.left()
+    assert output[0] == "\x1b[K"
+    assert line.suggestion == ""
+
+
+class _Screen:
+
+    def __init__(self, columns: int, rows: int = 8):
+        self.columns = columns
+        self.cells = [[" "] * columns for _ in range(rows)]
+        self.row = 0
+        self.column = 0
+        self.is_wrap_pending = False
+
+    @property
+    def text(self):
+        return "".join("".join(row) for row in self.cells).rstrip()
+
+    def write(self, data: str):
+        index = 0
+
+        while index < len(data):
+            if match := CONTROL_PATTERN.match(data, index):
+                self._control(int(match[1] or 1), match[2])
+                index = match.end()
+                continue
+
+            self._character(data[index])
+            index += 1
+
+    def _character(self, character: str):
+        if character == "\r":
+            self.column = 0
+        elif character == "\n":
+            self.row += 1
+        elif character == "\b":
+            self.column = max(self.column - 1, 0)
+        else:
+            if self.is_wrap_pending:
+                self.row += 1
+                self.column = 0
+
+            self.cells[self.row][self.column] = character
+
+            if self.column == self.columns - 1:
+                self.is_wrap_pending = True
+                return
+
+            self.column += 1
+
+        self.is_wrap_pending = False
+
+    def _control(self, count: int, final: str):
+        self.is_wrap_pending = False
+        row = self.cells[self.row]
+
+        if final == "A":
+            self.row -= count
+        elif final == "B":
+            self.row += count
+        elif final == "C":
+            self.column = min(self.column + count, self.columns - 1)
+        elif final == "D":
+            self.column = max(self.column - count, 0)
+        elif final == "@":
+            row[self.column:self.column] = [" "] * count
+            del row[self.columns:]
+        elif final == "P":
+            del row[self.column:self.column + count]
+            row += [" "] * (self.columns - len(row))
+        elif final in "KJ":
+            row[self.column:] = [" "] * (self.columns - self.column)
+
+            if final == "J":
+                for below in self.cells[self.row + 1:]:
+                    below[:] = [" "] * self.columns
+
+
+def test_line_editor_redraws_lines_wider_than_the_terminal(monkeypatch):
+    monkeypatch.setattr(editor, "columns", lambda: 10)
+
+    screen = _Screen(10)
+    screen.write("$ ")
+    line = LineEditor(screen.write, 2)
+
+    def check(suggestion=""):
+        assert screen.text == "$ " + line.text + suggestion
+
+        cursor = 2 + len(line.text) - len(line._buffer.after_cursor())
+        assert (screen.row, screen.column) == divmod(cursor, 10)
+        assert not screen.is_wrap_pending
+
+    line.insert("echo hello")
+    check()
+
+    line.insert(" world")
+    check()
+
+    line.left(6)
+    line.insert("big ")
+    check()
+
+    line.backspace()
+    line.backspace()
+    check()
+
+    line.delete()
+    line.word_left()
+    check()
+
+    line.home()
+    line.insert("x")
+    check()
+
+    line.end()
+    line.suggest(" again")
+    check(" again")
+
+    line.insert(" a")
+    check("gain")
+
+    line.replace("ls")
+    check()
+
+    line.insert("-" * 8)
+    check()
+
+    line.clear()
+    assert screen.text == ""
+    assert (screen.row, screen.column) == (0, 0)
+
+    line.redraw("$ ", "echo short")
+    check()
+
+
+def test_wrapped_edit_redraws_at_most_a_screen(monkeypatch):
+    monkeypatch.setattr(editor, "columns", lambda: 10)
+    monkeypatch.setattr(editor, "rows", lambda: 4)
+
+    sizes = []
+
+    for length in (1_000, 100_000):
+        output = []
+        line = LineEditor(output.append, 2)
+        line.insert("x" * length)
+        line.left(length // 2)
+
+        output.clear()
+        line.insert("y")
+
+        sizes.append(len("".join(output)))
+
+    assert sizes[0] == sizes[1]
+    assert sizes[0] < 4 * 10 + 20
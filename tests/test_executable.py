@@ -0,0 +1,91 @@
+import os
+
+from app import executable
+
+
+def _make_executable(directory, name):
+    path = os.path.join(directory, name)
+
+    with open(path, "w") as fd:
+        fd.write("#!/bin/sh\n")
+
+    os.chmod(path, 0o755)
+    return path
+
+
+def test_which_remembers_path(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", str(tmp_path))
+    path = _make_executable(str(tmp_path), "foo")
+
+    assert executable.which("foo") == path
+    assert executable.which("foo") == path
+    assert executable.hashed["foo"].hits == 2
+
+
+def test_which_invalidates_on_path_change(tmp_path, monkeypatch):
+    first = tmp_path / "first"
+    second = tmp_path / "second"
+    first.mkdir()
+    second.mkdir()
+
+    monkeypatch.setenv("PATH", f"{first}:{second}")
+    _make_executable(str(second), "foo")
+    assert executable.which("foo") == str(second / "foo")
+
+    monkeypatch.setenv("PATH", str(first))
+    assert executable.which("foo") is None
+
+
+def test_which_forgets_disappeared_path(tmp_path, monkeypatch):
+    first = tmp_path / "first"
+    second = tmp_path / "second"
+    first.mkdir()
+    second.mkdir()
+
+    monkeypatch.setenv("PATH", f"{first}:{second}")
+    path = _make_executable(str(first), "foo")
+    fallback = _make_executable(str(second), "foo")
+
+    assert executable.which("foo") == path
+
+    os.remove(path)
+    assert executable.which("foo") == fallback
+
+
+def test_which_finds_file_made_executable(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", str(tmp_path))
+    monkeypatch.setattr(executable, "RACY_WINDOW_NS", 0)
+    path = tmp_path / "baz"
+    path.write_text("#!/bin/sh\n")
+
+    assert executable.which("baz") is None
+    assert str(tmp_path) in executable.indexed
+
+    path.chmod(0o755)
+    assert executable.which("baz") == str(path)
+    assert executable.candidates().starting_with("ba") == ["baz"]
+
+
+def test_remember_seeds_table(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", str(tmp_path))
+    path = _make_executable(str(tmp_path), "bar")
+
+    executable.rehash()
+    executable.remember("foo", path)
+
+    assert executable.which("foo") == path
+    assert executable.forget("foo")
+    assert not executable.forget("foo")
+
+
+def test_complete_refreshes_on_directory_change(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", str(tmp_path))
+    _make_executable(str(tmp_path), "foo")
+    (tmp_path / "fox").write_text("not executable")
+
+    assert executable.candidates().starting_with("fo") == ["foo"]
+
+    _make_executable(str(tmp_path), "fob")
+
+    assert executable.candidates().starting_with("fo") == ["fob", "foo"]
+    assert executable.candidates().count("x") == 0
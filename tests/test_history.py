@@ -0,0 +1,231 @@
+import fcntl
+import os
+
+import pytest
+
+from app import history, lines
+from app.lines import Lines, FileLines
+from app.search import PrefixIndex, TrigramIndex
+
+
+@pytest.fixture(autouse=True)
+def fresh_history(monkeypatch):
+    monkeypatch.setattr(history, "previous_lines", Lines())
+    monkeypatch.setattr(history, "last_append_index", 0)
+    monkeypatch.setattr(history, "index", TrigramIndex())
+    monkeypatch.setattr(history, "prefixes", PrefixIndex())
+    monkeypatch.setattr(history, "file_inode", None)
+    monkeypatch.setattr(history, "file_offset", 0)
+    monkeypatch.setattr(history, "session_fd", None)
+    monkeypatch.delenv(history.SIZE_ENVVAR, raising=False)
+    monkeypatch.delenv(history.FILE_SIZE_ENVVAR, raising=False)
+    monkeypatch.delenv(history.CONTROL_ENVVAR, raising=False)
+    monkeypatch.delenv(history.SHARE_ENVVAR, raising=False)
+
+
+def test_mapped_lines_skip_empty_lines_across_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(lines, "BLOCK_SIZE", 16)
+
+    expected = [f"echo {number}" for number in range(100)]
+
+    path = tmp_path / "history"
+    path.write_text("\n" + "\n\n".join(expected) + "\n\n\nlast")
+    expected.append("last")
+
+    mapped = FileLines(str(path))
+
+    assert len(mapped) == len(expected)
+    assert [mapped[index] for index in range(len(mapped))] == expected
+
+
+def test_file_lines_survive_truncation_by_another_process(tmp_path):
+    path = tmp_path / "history"
+    path.write_text("".join(f"echo {number}\n" for number in range(1000)))
+
+    file_lines = FileLines(str(path))
+    path.write_text("echo 0\n")
+
+    assert len(file_lines) == 1000
+    assert file_lines[0] == "echo 0"
+    assert file_lines[999] == ""
+
+
+def test_write_keeps_mode_and_symlink(tmp_path, monkeypatch):
+    target = tmp_path / "target"
+    target.write_text("echo old\n")
+    target.chmod(0o640)
+
+    link = tmp_path / "history"
+    link.symlink_to(target)
+
+    history.read(str(link))
+    history.add_line("echo new")
+    history.write(str(link))
+
+    assert link.is_symlink()
+    assert target.read_text() == "echo old\necho new\n"
+    assert target.stat().st_mode & 0o777 == 0o640
+
+
+def test_history_size_drops_oldest_entries(monkeypatch):
+    monkeypatch.setenv(history.SIZE_ENVVAR, "3")
+
+    for number in range(5):
+        history.add_line(f"echo {number}")
+
+    assert list(history.previous_lines) == ["echo 2", "echo 3", "echo 4"]
+    assert list(history.iterate(2)) == [(4, "echo 3"), (5, "echo 4")]
+    assert history.search("echo 1") is None
+    assert history.search("echo 3") == 1
+
+
+def test_write_keeps_last_file_size_entries(tmp_path, monkeypatch):
+    path = tmp_path / "history"
+    path.write_text("one\ntwo\nthree\n")
+
+    history.read(str(path))
+    history.add_line("four")
+
+    monkeypatch.setenv(history.FILE_SIZE_ENVVAR, "2")
+    history.write(str(path))
+
+    assert path.read_text() == "three\nfour\n"
+    assert history.previous_lines[0] == "one"
+
+    history.add_line("five")
+    history.write(str(path), append=True)
+
+    assert path.read_text() == "three\nfour\nfive\n"
+
+
+def test_compact_lines_index_and_drop_front():
+    compact = lines.CompactLines()
+
+    for number in range(10):
+        compact.append(f"echo {number} é")
+
+    assert len(compact) == 10
+    assert compact[3] == "echo 3 é"
+    assert compact[-1] == "echo 9 é"
+    assert compact[8:] == ["echo 8 é", "echo 9 é"]
+
+    compact.drop_front(8)
+    assert len(compact) == 2
+    assert compact[0] == "echo 8 é"
+
+
+def test_history_control_ignores_spaces_and_erases_duplicates(monkeypatch):
+    monkeypatch.setenv(history.CONTROL_ENVVAR, "ignorespace:erasedups")
+
+    for line in ["ls", "cd /", " secret", "ls", "pwd", "ls"]:
+        history.add_line(line)
+
+    assert list(history.previous_lines) == ["cd /", "pwd", "ls"]
+    assert history.search("cd") == 0
+    assert history.search("ls") == 2
+
+    monkeypatch.setenv(history.CONTROL_ENVVAR, "ignoredups")
+    history.add_line("ls")
+
+    assert list(history.previous_lines) == ["cd /", "pwd", "ls"]
+
+
+def test_shared_history_picks_up_other_sessions(tmp_path, monkeypatch):
+    path = tmp_path / "history"
+    monkeypatch.setenv(history.FILE_ENVVAR, str(path))
+    monkeypatch.setenv(history.SHARE_ENVVAR, "1")
+
+    history.add_line("echo first")
+
+    with open(path, "a") as fd:
+        fd.write("echo other\n")
+
+    history.synchronize()
+    history.add_line("echo second")
+
+    assert list(history.previous_lines) == ["echo first", "echo other", "echo second"]
+    assert path.read_text() == "echo first\necho other\necho second\n"
+
+
+def test_shared_history_is_trimmed_in_place_by_the_last_session(tmp_path, monkeypatch):
+    path = tmp_path / "history"
+    path.write_text("".join(f"echo {number}\n" for number in range(10)))
+    inode = path.stat().st_ino
+
+    monkeypatch.setenv(history.FILE_ENVVAR, str(path))
+    monkeypatch.setenv(history.SHARE_ENVVAR, "1")
+    monkeypatch.setenv(history.FILE_SIZE_ENVVAR, "3")
+
+    other = os.open(f"{path}{history.LOCK_SUFFIX}", os.O_RDWR | os.O_CREAT)
+    fcntl.flock(other, fcntl.LOCK_SH)
+
+    try:
+        history.initialize()
+        history.destroy()
+    finally:
+        os.close(other)
+
+    assert len(path.read_text().splitlines()) == 10
+    assert history.session_fd is None
+
+    history.initialize()
+    history.destroy()
+
+    assert path.read_text() == "echo 7\necho 8\necho 9\n"
+    assert path.stat().st_ino == inode
+
+
+def test_erased_duplicates_are_found_without_decoding_the_file(tmp_path, monkeypatch):
+    path = tmp_path / "history"
+    path.write_text("ls\nls -l\ncd /\nls\n")
+
+    monkeypatch.setenv(history.CONTROL_ENVVAR, "erasedups")
+    history.read(str(path))
+
+    history.add_line("ls")
+
+    assert list(history.previous_lines) == ["ls -l", "cd /", "ls"]
+    assert len(history.index) == 0
+
+
+def test_suggestion_comes_from_most_recent_live_entry(monkeypatch):
+    monkeypatch.setenv(history.SIZE_ENVVAR, "3")
+
+    for line in ["git status", "git commit", "ls", "git stash"]:
+        history.add_line(line)
+
+    assert history.suggest("git st") == "ash"
+    assert history.suggest("git c") == "ommit"
+    assert history.suggest("git stash") is None
+    assert history.suggest("git status") is None
+    assert history.suggest("") is None
+
+
+def test_trimmed_entries_leave_the_indexes(monkeypatch):
+    monkeypatch.setenv(history.SIZE_ENVVAR, "2")
+
+    for number in range(100):
+        history.add_line(f"echo {number}")
+
+    assert history.search("echo 9") == 1
+    assert history.suggest("echo 9") == "9"
+    assert history.prefixes.newest("echo 5") is None
+    assert list(history.index.candidates("echo 5", 100)) == []
+
+
+def test_loaded_history_is_indexed_in_steps(tmp_path, monkeypatch):
+    monkeypatch.setattr(history, "INDEX_STEP", 10)
+
+    path = tmp_path / "history"
+    path.write_text("".join(f"echo {number}\n" for number in range(100)))
+    history.read(str(path))
+
+    assert len(history.index) == 0
+    assert history.search("echo 1") == 19
+    assert len(history.index) == 0
+
+    while history.index_pending():
+        pass
+
+    assert len(history.index) == 100
+    assert history.search("o 5") == 59
@@ -0,0 +1,138 @@
+import os
+import select
+import signal
+import subprocess
+import time
+
+import pytest
+
+from app import job
+
+
+@pytest.fixture(autouse=True)
+def handler(monkeypatch):
+    monkeypatch.setattr(job, "running", {})
+    monkeypatch.setattr(job, "by_pid", {})
+    monkeypatch.setattr(job, "finished", [])
+
+    previous = signal.getsignal(signal.SIGCHLD)
+    job.initialize()
+
+    yield
+
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGCHLD, previous)
+    os.close(job.wakeup_fd)
+
+
+def _spawn(*arguments: str):
+    return os.posix_spawnp(arguments[0], list(arguments), os.environ)
+
+
+def _spawn_group(*arguments: str):
+    return os.posix_spawnp(arguments[0], list(arguments), os.environ, setpgroup=0)
+
+
+def _wait_for(predicate):
+    deadline = time.monotonic() + 5
+
+    while not predicate() and time.monotonic() < deadline:
+        select.select([job.wakeup_fd], [], [], 0.05)
+
+
+def test_finished_jobs_are_recorded_and_reported(capsys):
+    # registered before the handler can run, as a pipeline does, or it would discard the statuses
+    with job.deferred_reaping():
+        job.add([_spawn("true"), _spawn("sh", "-c", "exit 3")], "true | sh -c 'exit 3'")
+
+    _wait_for(lambda: job.finished)
+
+    finished = job.finished[0]
+    assert finished.statuses[finished.pid] == 3
+    assert set(finished.usages) == set(finished.pids)
+
+    job.notify()
+
+    assert capsys.readouterr().out.splitlines()[-1] == "[1]+  Exit 3               true | sh -c 'exit 3'"
+    assert not job.running
+    assert not job.by_pid
+
+
+def test_handler_drains_other_children():
+    process = subprocess.Popen(["echo", "done"], stdout=subprocess.PIPE, text=True)
+
+    with job.deferred_reaping():
+        job.add([_spawn("sh", "-c", "sleep 0.1")], "sleep")
+
+    _wait_for(lambda: job.finished)
+
+    # reaped by the handler, popen still completes
+    assert process.communicate()[0] == "done\n"
+    assert job.finished[0].status == 0
+
+
+def test_notify_leaves_a_fresh_list():
+    with job.deferred_reaping():
+        job.add([_spawn("true")], "true")
+
+    _wait_for(lambda: job.finished)
+    reported = job.finished
+
+    assert job.notify() == 1
+    assert job.finished is not reported
+    assert not job.finished
+
+
+def test_job_killed_by_signal_is_reported_by_name(capsys):
+    with job.deferred_reaping():
+        pid = _spawn_group("sleep", "5")
+        job.add([pid], "sleep 5")
+
+    os.kill(pid, signal.SIGTERM)
+    _wait_for(lambda: job.finished)
+
+    job.notify()
+
+    assert capsys.readouterr().out.splitlines()[-1] == "[1]+  Terminated           sleep 5"
+
+
+def test_wait_blocks_on_one_job():
+    with job.deferred_reaping():
+        job.add([_spawn_group("sh", "-c", "sleep 0.1; exit 4")], "sleep")
+        other = job.add([_spawn_group("sleep", "5")], "sleep 5")
+
+    assert job.wait_job(job.find("%1")) == 4
+    assert list(job.running) == [2]
+
+    job.kill(other, signal.SIGKILL)
+    assert job.wait_job(other) == 128 + signal.SIGKILL
+
+
+def test_wait_next_returns_first_finished():
+    with job.deferred_reaping():
+        job.add([_spawn_group("sleep", "5")], "sleep 5")
+        job.add([_spawn_group("sh", "-c", "exit 6")], "exit 6")
+
+    assert job.wait_next() == 6
+    assert list(job.running) == [1]
+
+    job.kill(job.find("%1"), signal.SIGTERM)
+    job.wait_all()
+
+    assert not job.running
+    assert job.wait_next() is None
+
+
+def test_stopped_job_is_resumed_in_foreground(capsys):
+    # stops only once foreground is waiting, since the hand-over resumes a job that stopped before it
+    pid = _spawn_group("sh", "-c", "sleep 0.2; kill -STOP $$; exit 2")
+    current = job.RunningJob(0, [pid], "stop", pid)
+
+    assert not job.foreground(current)
+    assert current.is_stopped
+    assert job.find("%+") is current
+    assert capsys.readouterr().out.splitlines()[-1] == "[1]+  Stopped              stop"
+
+    assert job.foreground(current)
+    assert current.status == 2
+    assert not job.running
@@ -0,0 +1,70 @@
+import os
+import pty
+import select
+import subprocess
+import sys
+import time
+
+import pytest
+
+PROMPT = b"$ "
+
+
+# login_tty makes the pty the controlling terminal, which forkpty would do in a process that may have threads
+START_SHELL = "import os, runpy; os.login_tty(0); runpy.run_module('app.main', run_name='__main__')"
+
+
+def _shell(directory):
+    fd, terminal_fd = pty.openpty()
+
+    environment = dict(os.environ)
+    environment["PYTHONPATH"] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    environment.pop("HISTFILE", None)
+    environment.pop("HISTDB", None)
+
+    process = subprocess.Popen(
+        [sys.executable, "-c", START_SHELL],
+        stdin=terminal_fd,
+        stdout=terminal_fd,
+        stderr=terminal_fd,
+        cwd=directory,
+        env=environment,
+    )
+    os.close(terminal_fd)
+
+    return process, fd
+
+
+def _read_until(fd: int, output: bytearray, prompts: int):
+    deadline = time.monotonic() + 10
+
+    while output.count(PROMPT) < prompts:
+        if time.monotonic() > deadline:
+            pytest.fail(f"no prompt, got: {bytes(output[-500:])!r}")
+
+        ready, _, _ = select.select([fd], [], [], 0.1)
+        if ready:
+            try:
+                output += os.read(fd, 65536)
+            except OSError:
+                pytest.fail(f"shell exited, got: {bytes(output[-2000:])!r}")
+
+
+def test_many_short_foreground_commands(tmp_path):
+    process, fd = _shell(tmp_path)
+    output = bytearray()
+
+    try:
+        _read_until(fd, output, 1)
+
+        for count in range(2, 202):
+            os.write(fd, b"true\r")
+            _read_until(fd, output, count)
+
+        os.write(fd, b"exit 0\r")
+        status = process.wait(timeout=10)
+    finally:
+        os.close(fd)
+
+    assert b"Traceback" not in output
+    assert status == 0
@@ -0,0 +1,125 @@
+import dataclasses
+import random
+
+import pytest
+from reference_parser import ReferenceLineParser
+
+from app import parser, run, variable
+from app.parser import Argument, LineParser, ParseCache
+
+LINES = [
+    "",
+    "   ",
+    "echo hello world",
+    "echo   spaced    out  ",
+    "echo 'single quoted'  \"double quoted\"",
+    "echo a'b'\"c\"d",
+    "echo ''",
+    "echo \"\" x",
+    "echo \"a\\\"b\\\\c\\d\"",
+    "echo a\\ b \\'c",
+    "echo \\",
+    "echo \"unterminated",
+    "echo 'unterminated",
+    "echo $HOME ${HOME}x $ ${ ${a-b} $_x1",
+    "echo a$HOME'b'",
+    "echo hi > out.txt",
+    "echo hi >> out.txt",
+    "echo hi 2> err.txt 1>>out.txt",
+    "echo a2>b",
+    "echo x >",
+    "ls | grep a | wc -l",
+    "ls |",
+    "sleep 1 &",
+    "echo ٢>b",
+    "echo tab\there",
+]
+
+
+def _assert_equivalent(line: str):
+    assert LineParser(line).parse() == ReferenceLineParser(line).parse(), repr(line)
+
+
+@pytest.mark.parametrize("line", LINES)
+def test_matches_reference_parser(line):
+    _assert_equivalent(line)
+
+
+def test_matches_reference_parser_on_random_lines():
+    generator = random.Random(1234)
+    alphabet = " '\"\\>|$&{}_ab12\t\0"
+
+    for _ in range(5_000):
+        _assert_equivalent("".join(generator.choices(alphabet, k=generator.randrange(20))))
+
+
+def test_long_quoted_argument():
+    payload = "x" * 100_000
+
+    commands = LineParser(f"echo '{payload}' \"{payload}\"").parse()
+
+    assert commands[0].arguments == ["echo", payload, payload]
+
+
+def test_parse_cache_reuses_trees_and_resolves_variables_late(monkeypatch):
+    cache = ParseCache(capacity=2)
+    monkeypatch.setitem(variable.store, "NAME", "first")
+
+    commands = cache.parse("echo $NAME")
+    assert cache.parse("echo $NAME") is commands
+    assert commands[0].arguments == ["echo", "first"]
+
+    monkeypatch.setitem(variable.store, "NAME", "second")
+    assert cache.parse("echo $NAME")[0].arguments == ["echo", "second"]
+
+    cache.parse("ls")
+    cache.parse("pwd")
+    assert cache.parse("echo $NAME") is not commands
+
+    assert (cache.hits, cache.misses, len(cache)) == (2, 4, 2)
+    assert cache.hit_rate == 2 / 6
+
+
+def test_history_stats_report_the_parse_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(parser, "cache", ParseCache())
+    output = tmp_path / "output"
+    line = f"history --stats > {output}"
+
+    parser.parse(line)
+    run.single(parser.parse(line)[0])
+
+    assert output.read_text() == "hits 1, misses 1, entries 1, hit rate 50.0%\n"
+
+
+def test_only_arguments_with_variables_are_expanded_again(monkeypatch):
+    resolved = []
+    resolve = Argument.resolve
+
+    def counting_resolve(argument, variables):
+        resolved.append(argument)
+        return resolve(argument, variables)
+
+    monkeypatch.setattr(Argument, "resolve", counting_resolve)
+    monkeypatch.setattr(variable, "store", variable.Store(NAME="first"))
+
+    command = LineParser("echo $NAME plain").parse()[0]
+
+    assert command.program == "echo"
+    assert command.arguments == ["echo", "first", "plain"]
+    assert len(resolved) == 3
+
+    variable.set("NAME", "second")
+
+    assert command.arguments == ["echo", "second", "plain"]
+    assert resolved[3:] == [command.raw_arguments[1]]
+
+
+def test_expansion_leaves_nodes_untouched():
+    command = LineParser("echo one two").parse()[0]
+
+    arguments = command.arguments
+    arguments.append("three")
+
+    assert command.arguments == ["echo", "one", "two"]
+    assert [field.name for field in dataclasses.fields(command)] == ["raw_arguments", "redirects", "is_job"]
+    assert [field.name for field in dataclasses.fields(command.raw_arguments[0])] == ["parts"]
@@ -0,0 +1,176 @@
+import os
+import signal
+import stat
+import time
+
+import pytest
+
+from app import job, parser, run, variable
+
+
+def test_pipeline_spawns_with_redirects_and_status(tmp_path):
+    output = tmp_path / "output"
+
+    run.pipeline(parser.parse(f"printf 'hello world' | tr a-z A-Z > {output}"))
+    assert output.read_text() == "HELLO WORLD"
+    assert run.last_status == 0
+
+    run.single(parser.parse("sh -c 'exit 3'")[0])
+    assert run.last_status == 3
+
+
+def test_pipeline_reports_every_stage(monkeypatch):
+    monkeypatch.setattr(variable, "store", variable.Store())
+    monkeypatch.setattr(variable, "options", set())
+
+    run.pipeline(parser.parse("false | sh -c 'exit 2' | true"))
+    assert run.pipe_status == [1, 2, 0]
+    assert run.last_status == 0
+    assert variable.get("PIPESTATUS") == "1 2 0"
+    assert parser.parse("echo $? ${?}")[0].arguments == ["echo", "0", "0"]
+
+    variable.options.add(run.PIPEFAIL_OPTION)
+
+    run.pipeline(parser.parse("false | sh -c 'exit 2' | true"))
+    assert run.last_status == 2
+    assert variable.get("?") == "2"
+
+    run.pipeline(parser.parse("sh -c 'kill -9 $$'"))
+    assert run.last_status == 137
+
+
+def test_builtin_stages_run_without_forking(tmp_path, monkeypatch):
+    output = tmp_path / "output"
+
+    def no_fork():
+        raise AssertionError("forked")
+
+    monkeypatch.setattr(run.os, "fork", no_fork)
+
+    run.pipeline(parser.parse(f"echo one two | tr a-z A-Z > {output}"))
+    assert output.read_text() == "ONE TWO\n"
+
+    run.pipeline(parser.parse(f"printf 'a b' | echo ignored input > {output}"))
+    assert output.read_text() == "ignored input\n"
+    assert run.pipe_status[-1] == 0
+
+
+def test_job_control_builtins_set_status(monkeypatch):
+    monkeypatch.setattr(job, "running", {})
+    monkeypatch.setattr(job, "by_pid", {})
+    monkeypatch.setattr(job, "finished", [])
+
+    previous = signal.getsignal(signal.SIGCHLD)
+    job.initialize()
+
+    try:
+        run.pipeline(parser.parse("sh -c 'exit 5' &"))
+        run.single(parser.parse("wait %1")[0])
+        assert run.last_status == 5
+
+        run.single(parser.parse("wait %1")[0])
+        assert run.last_status == 127
+
+        run.pipeline(parser.parse("sleep 5 &"))
+        run.single(parser.parse("kill -KILL %1")[0])
+        run.single(parser.parse("wait")[0])
+        assert run.last_status == 0
+        assert not job.running
+
+        run.single(parser.parse("kill -s BOGUS 1")[0])
+        assert run.last_status == 1
+    finally:
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGCHLD, previous)
+        os.close(job.wakeup_fd)
+
+
+# the builtin forks while the other one runs on its thread, which is the case being tested
+@pytest.mark.filterwarnings("ignore:This process .* is multi-threaded:DeprecationWarning")
+def test_forked_stage_does_not_hold_builtin_pipes(tmp_path, monkeypatch):
+    output = tmp_path / "output"
+    held = []
+
+    def slow_echo(arguments, redirected_streams):
+        held.append(os.fstat(redirected_streams.output_fd).st_ino)
+        time.sleep(0.3)
+
+    def list_pipes(arguments, redirected_streams):
+        pipes = []
+        for fd in range(3, 256):
+            try:
+                status = os.fstat(fd)
+            except OSError:
+                continue
+
+            if stat.S_ISFIFO(status.st_mode):
+                pipes.append(str(status.st_ino))
+
+        output.write_text(" ".join(pipes))
+
+    monkeypatch.setitem(run.BUILTINS, "echo", slow_echo)
+    monkeypatch.setitem(run.BUILTINS, "cd", list_pipes)
+
+    run.pipeline(parser.parse("echo | cat | cd"))
+
+    assert str(held[0]) not in output.read_text().split()
+
+
+def test_builtin_stage_unlists_its_descriptors_as_it_closes():
+    read_fd, write_fd = os.pipe()
+    held_fds = [write_fd]
+
+    stage = run.BuiltinStage(parser.parse("echo done")[0], write_fd, held_fds)
+    os.close(write_fd)
+    assert len(held_fds) == 2
+
+    stage.start()
+    stage.join()
+
+    # only the earlier stage's number is left, the one this stage held may already belong to something else
+    assert held_fds == [write_fd]
+
+    with os.fdopen(read_fd) as output:
+        assert output.read() == "done\n"
+
+
+def test_jobs_stage_leaves_finished_jobs_to_the_shell(tmp_path, monkeypatch):
+    monkeypatch.setattr(job, "running", {})
+    monkeypatch.setattr(job, "by_pid", {})
+    monkeypatch.setattr(job, "finished", [])
+
+    previous = signal.getsignal(signal.SIGCHLD)
+    job.initialize()
+
+    output = tmp_path / "output"
+
+    try:
+        run.pipeline(parser.parse("true &"))
+        job._block_until(lambda: job.finished)
+
+        run.pipeline(parser.parse(f"printf x | jobs > {output}"))
+        assert "Done" in output.read_text()
+        assert list(job.running) == [1]
+        assert job.finished
+
+        run.pipeline(parser.parse(f"printf x | type jobs > {output}"))
+        assert output.read_text() == "jobs is a shell builtin\n"
+
+        run.single(parser.parse(f"jobs > {output}")[0])
+        assert not job.running
+    finally:
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGCHLD, previous)
+        os.close(job.wakeup_fd)
+
+
+def test_launch_failure_is_not_executable(tmp_path):
+    program = tmp_path / "program"
+    program.write_bytes(b"\x7fELF garbage")
+    program.chmod(0o755)
+
+    run.pipeline(parser.parse(f"true | {program}"))
+    assert run.pipe_status == [0, 126]
+
+    run.pipeline(parser.parse(f"{tmp_path / 'missing'} | true"))
+    assert run.pipe_status == [127, 0]
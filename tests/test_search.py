@@ -0,0 +1,63 @@
+from app.search import PrefixIndex, TrigramIndex
+
+
+def test_candidates_come_from_rarest_trigram_most_recent_first():
+    index = TrigramIndex()
+
+    for number, line in enumerate(["git status", "git commit", "ls", "git commit --amend"]):
+        index.add(number, line)
+
+    assert list(index.candidates("commit", 4)) == [3, 1]
+    assert list(index.candidates("commit", 3)) == [1]
+    assert list(index.candidates("nothing", 4)) == []
+    assert list(index.candidates("gi", 4)) == [3, 1, 0]
+    assert list(index.candidates("l", 4)) == [2]
+    assert index.candidates("", 4) is None
+    assert len(index) == 4
+
+
+def test_candidates_have_every_trigram_of_the_query():
+    index = TrigramIndex()
+
+    for number, line in enumerate(["abcd", "abc", "xbcd", "abc"]):
+        index.add(number, line)
+
+    assert list(index.candidates("abcd", 4)) == [0]
+
+    index.prune(1)
+    assert list(index.candidates("abcd", 4)) == []
+    assert list(index.candidates("abc", 4)) == [3, 1]
+
+
+def test_prefix_index_returns_most_recent_match():
+    index = PrefixIndex()
+
+    for number, line in enumerate(["git status", "git commit", "grep x", "git stash"]):
+        index.add(number, line)
+
+    assert index.newest("g") == 3
+    assert index.newest("git c") == 1
+    assert index.newest("git st") == 3
+    assert index.newest("git status") == 0
+    assert index.newest("gr") == 2
+    assert index.newest("git statuses") is None
+    assert index.newest("ls") is None
+    assert len(index) == 4
+
+
+def test_prefix_index_prunes_older_entries():
+    index = PrefixIndex()
+
+    for number, line in enumerate(["git status", "git commit", "grep x", "git stash"]):
+        index.add(number, line)
+
+    index.prune(2)
+
+    assert index.newest("git c") is None
+    assert index.newest("git s") == 3
+    assert index.newest("gr") == 2
+
+    index.prune(4)
+
+    assert index.newest("g") is None
+    assert index.newest("") is None
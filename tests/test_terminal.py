@@ -0,0 +1,97 @@
+import os
+import time
+
+from app import terminal
+
+
+def _reader(*chunks: bytes):
+    read_fd, write_fd = os.pipe()
+
+    for chunk in chunks:
+        os.write(write_fd, chunk)
+
+    os.close(write_fd)
+    return terminal.KeyReader(read_fd)
+
+
+def _keys(reader: terminal.KeyReader):
+    keys = []
+
+    while (key := reader.next()) is not None:
+        keys.append(key)
+
+    return keys
+
+
+def test_reader_groups_text_and_escape_sequences():
+    reader = _reader("echo héllo\t\x1b[A\x7f\n".encode())
+
+    assert _keys(reader) == ["echo héllo", "\t", terminal.UP, "\x7f", "\n"]
+
+
+def test_reader_collects_bracketed_paste():
+    keys = _keys(_reader(b"a\x1b[200~one\ttwo\r\nthree\x1b[201~b"))
+
+    assert keys == ["a", "one\ttwo\nthree", "b"]
+    assert isinstance(keys[1], terminal.Paste)
+
+
+def test_display_uses_caret_notation():
+    assert terminal.display("a\tb\nc") == "a^Ib^Jc"
+
+
+def test_reader_collects_paste_spanning_reads():
+    text = "x" * (terminal.CHUNK_SIZE * 3)
+    keys = _keys(_reader(f"{terminal.PASTE_START}{text}{terminal.PASTE_END}".encode()))
+
+    assert keys == [text]
+
+
+def test_reader_leaves_typeahead_after_a_line():
+    read_fd, write_fd = os.pipe()
+    os.write(write_fd, b"ls\rcat\r")
+
+    reader = terminal.KeyReader(read_fd)
+
+    assert [reader.next(), reader.next()] == ["ls", "\r"]
+    assert os.read(read_fd, 100) == b"cat\r"
+
+    os.close(write_fd)
+    os.close(read_fd)
+
+
+def test_lone_escape_times_out():
+    read_fd, write_fd = os.pipe()
+    os.write(write_fd, b"\x1b")
+
+    reader = terminal.KeyReader(read_fd)
+    started = time.monotonic()
+
+    assert reader.next() == terminal.ESCAPE
+    assert time.monotonic() - started < 5
+
+    os.write(write_fd, b"f")
+    assert reader.next() == "f"
+
+    os.close(write_fd)
+    os.close(read_fd)
+
+
+def test_reader_runs_idle_steps_until_input():
+    read_fd, write_fd = os.pipe()
+    steps = []
+
+    def idle():
+        steps.append(len(steps))
+        if len(steps) == 3:
+            os.write(write_fd, b"a")
+
+        return True
+
+    reader = terminal.KeyReader(read_fd, idle=idle)
+
+    assert reader.next() == "a"
+    assert len(steps) == 3
+
+    os.close(write_fd)
+    os.close(read_fd)
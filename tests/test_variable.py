@@ -1,4 +1,7 @@
-from app.variable import is_valid_identifier
+import os
+
+from app import run, variable
+from app.variable import Store, is_valid_identifier
 
 def test_is_valid_identifier():
     assert is_valid_identifier("foo")
@@ -7,3 +10,56 @@ def test_is_valid_identifier():
     assert not is_valid_identifier("1foo")
     assert not is_valid_identifier("foo-bar")
     assert not is_valid_identifier("pear-mango")
+
+
+def test_store_generation_changes_on_every_mutation():
+    store = Store()
+    generations = [store.generation]
+
+    store["a"] = "1"
+    generations.append(store.generation)
+    store.update(b="2")
+    generations.append(store.generation)
+    del store["a"]
+    generations.append(store.generation)
+
+    assert len(set(generations)) == 4
+    assert Store().generation not in generations
+
+
+def test_exported_variables_reach_spawned_programs(monkeypatch):
+    monkeypatch.setattr(variable, "store", Store())
+    monkeypatch.setattr(variable, "exported", set())
+
+    name = "SHELL_EXPORT_TEST"
+
+    def spawned():
+        read_fd, write_fd = os.pipe()
+        command = ["/bin/sh", "-c", f"echo ${{{name}-unset}}"]
+        pid = os.posix_spawn(command[0], command, run.INHERITED_ENVIRONMENT, file_actions=[(os.POSIX_SPAWN_DUP2, write_fd, 1)])
+        os.close(write_fd)
+
+        with os.fdopen(read_fd) as output:
+            value = output.read().strip()
+
+        os.waitpid(pid, 0)
+        return value
+
+    try:
+        variable.set(name, "local")
+        assert spawned() == "unset"
+
+        variable.export(name)
+        assert spawned() == "local"
+
+        variable.set(name, "changed")
+        assert spawned() == "changed"
+
+        variable.unexport(name)
+        assert spawned() == "unset"
+        assert variable.get(name) == "changed"
+
+        monkeypatch.setenv(name, "outside")
+        assert spawned() == "outside"
+    finally:
+        variable.unexport(name)